@@ -1,15 +1,137 @@
-from datetime import datetime
+import atexit
+import inspect
+import json
+import logging
+import logging.handlers
+import queue
+import random
 import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timezone
 from functools import wraps
 
-def log_queries():
+logger = logging.getLogger("queries")
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the structured query fields"""
+
+    FIELDS = ("query", "params", "duration_ms", "rows", "caller", "error")
+
+    def format(self, record):
+        created = datetime.fromtimestamp(record.created, timezone.utc)
+        data = {
+            "time": created.isoformat(),
+            "level": record.levelname,
+            "event": record.getMessage(),
+        }
+        for field in self.FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                data[field] = value
+        return json.dumps(data, default=repr)
+
+
+def start_query_logging(handler=None):
+    """Route query records through a queue to handler (JSON on stderr).
+
+    Decorated calls only enqueue the record; a background listener thread
+    does the formatting and I/O.
+    """
+    global _listener
+    # Decorated calls start logging lazily from any thread; the lock keeps
+    # two of them from each adding a handler and a listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        if handler is None:
+            handler = logging.StreamHandler(sys.stderr)
+            handler.setFormatter(JsonFormatter())
+        records = queue.SimpleQueue()
+        logger.addHandler(logging.handlers.QueueHandler(records))
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        _listener = logging.handlers.QueueListener(records, handler)
+        _listener.start()
+        atexit.register(stop_query_logging)
+
+
+def stop_query_logging():
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+def _log_call(args, kwargs, caller, start, result, error, sample_rate,
+              slow_ms):
+    duration_ms = (time.perf_counter() - start) * 1000
+    slow = slow_ms is not None and duration_ms >= slow_ms
+    if not (error or slow or random.random() < sample_rate):
+        return
+    query = kwargs.get('query') or (args[0] if args else '')
+    params = kwargs.get('params') or (args[1] if len(args) > 1 else None)
+    level = logging.WARNING if error or slow else logging.INFO
+    event = "query failed" if error else "slow query" if slow else "query"
+    logger.log(level, event, extra={
+        "query": query,
+        "params": params,
+        "duration_ms": round(duration_ms, 3),
+        "rows": len(result) if isinstance(result, list) else None,
+        "caller": f"{caller.f_code.co_filename}:{caller.f_lineno}",
+        "error": error,
+    })
+
+
+def log_queries(sample_rate=1.0, slow_ms=None):
+    """Log query, params, duration, row count and caller of each call.
+
+    Only a sample_rate fraction of calls is logged, except calls slower
+    than slow_ms (logged as warnings) and failed calls, which always are.
+    Coroutine functions are timed until their awaited result is ready.
+    """
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                if _listener is None:
+                    start_query_logging()
+                caller = sys._getframe(1)
+                start = time.perf_counter()
+                result = error = None
+                try:
+                    result = await func(*args, **kwargs)
+                    return result
+                except Exception as e:
+                    error = repr(e)
+                    raise
+                finally:
+                    _log_call(args, kwargs, caller, start, result, error,
+                              sample_rate, slow_ms)
+            return async_wrapper
+
         @wraps(func)
         def wrapper(*args, **kwargs):
-            query = kwargs.get('query') or (args[0] if args else '')
-            now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            print(f"[{now}] Executing SQL query: {query}")
-            return func(*args, **kwargs)
+            if _listener is None:
+                start_query_logging()
+            caller = sys._getframe(1)
+            start = time.perf_counter()
+            result = error = None
+            try:
+                result = func(*args, **kwargs)
+                return result
+            except Exception as e:
+                error = repr(e)
+                raise
+            finally:
+                _log_call(args, kwargs, caller, start, result, error,
+                          sample_rate, slow_ms)
         return wrapper
     return decorator
 
@@ -24,4 +146,4 @@ def fetch_all_users(query):
 
 
 users = fetch_all_users(query="SELECT * FROM users")
-print(users)
\ No newline at end of file
+print(users)
@@ -1,16 +1,7 @@
-import sqlite3
 import functools
 from functools import wraps
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('db.sqlite3')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
+from db_connection import with_db_connection
 
 @with_db_connection
 def get_user_by_id(conn, user_id):
@@ -1,23 +1,109 @@
-import sqlite3
 import functools
+import inspect
+import itertools
+import threading
+import time
+from contextlib import contextmanager
 from functools import wraps
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('db.sqlite3')
+from db_connection import DEFAULT_DB_PATH, connection_scope, with_db_connection
+
+_active = threading.local()
+
+
+class TransactionBatch:
+    """Groups transactional calls on one connection into shared commits.
+
+    Each call runs inside its own SAVEPOINT, so a failing call is rolled
+    back alone. The surrounding transaction is committed once max_calls
+    calls have succeeded, or on the first call after max_seconds.
+    """
+
+    def __init__(self, conn, max_calls=1000, max_seconds=1.0):
+        self.conn = conn
+        self.max_calls = max_calls
+        self.max_seconds = max_seconds
+        self.pending = 0
+        self.started = None
+        self.committed = 0
+        self.failed = 0
+
+    def run(self, func, *args, **kwargs):
+        conn = self.conn
+        if not conn.in_transaction:
+            # Without an explicit BEGIN the outermost SAVEPOINT would open
+            # the transaction and RELEASE would commit it on every call.
+            conn.execute("BEGIN")
+        if self.started is None:
+            self.started = time.monotonic()
+        conn.execute("SAVEPOINT batch_call")
+        try:
+            result = func(conn, *args, **kwargs)
+        except Exception:
+            conn.execute("ROLLBACK TO SAVEPOINT batch_call")
+            conn.execute("RELEASE SAVEPOINT batch_call")
+            self.failed += 1
+            print("[transaction] rollback of one batched call")
+            raise
+        conn.execute("RELEASE SAVEPOINT batch_call")
+        self.pending += 1
+        if (self.pending >= self.max_calls
+                or time.monotonic() - self.started >= self.max_seconds):
+            self.flush()
+        return result
+
+    def flush(self):
+        if self.conn.in_transaction:
+            self.conn.commit()
+            print(f"[transaction] commited batch of {self.pending}")
+        self.committed += self.pending
+        self.pending = 0
+        self.started = None
+
+
+@contextmanager
+def batch_transactions(db_path=DEFAULT_DB_PATH, max_calls=1000,
+                       max_seconds=1.0):
+    """Batch every transactional call made on this thread inside the block.
+
+    Pending calls are committed when the block exits normally and rolled
+    back if it raises; batches already flushed stay committed.
+    """
+    with connection_scope(db_path) as conn:
+        batch = TransactionBatch(conn, max_calls, max_seconds)
+        previous = getattr(_active, 'batch', None)
+        _active.batch = batch
         try:
-            print(f"[CONN] started")
-            return func(conn, *args, **kwargs)
-        
+            yield batch
+            batch.flush()
+        except BaseException:
+            conn.rollback()
+            print(f"[transaction] rollback of {batch.pending} pending calls")
+            raise
         finally:
-            print(f"[CONN] closed")
-            conn.close()
-    return wrapper
+            _active.batch = previous
+
 
 def transactional(func):
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            try:
+                result = await func(conn, *args, **kwargs)
+                await conn.commit()
+                print(f"[transaction] commited")
+                return result
+            except Exception as e:
+                await conn.rollback()
+                print(f"[transaction] rollback")
+                raise e
+        return async_wrapper
+
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
+        batch = getattr(_active, 'batch', None)
+        if batch is not None and batch.conn is conn:
+            return batch.run(func, *args, **kwargs)
         try:
             result = func(conn, *args, **kwargs)
             conn.commit()
@@ -35,5 +121,62 @@ def update_user_email(conn, user_id, new_email):
     cursor = conn.cursor()
     cursor.execute("UPDATE users SET email = ? WHERE user_id = ?", (new_email, user_id))
 
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+@with_db_connection
+@transactional
+def bulk_update_user_emails(conn, updates, chunk_size=5000,
+                            use_temp_table=False):
+    """Apply (user_id, new_email) pairs in one transaction.
+
+    Each chunk is a single executemany, or with use_temp_table a bulk
+    insert into a temp table joined into one UPDATE. Returns the number
+    of rows updated.
+    """
+    cursor = conn.cursor()
+    affected = 0
+    if not use_temp_table:
+        for chunk in _chunks(updates, chunk_size):
+            cursor.executemany("UPDATE users SET email = ? WHERE user_id = ?",
+                               [(email, user_id) for user_id, email in chunk])
+            affected += cursor.rowcount
+        return affected
+
+    cursor.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS email_updates (
+            user_id TEXT PRIMARY KEY,
+            email TEXT NOT NULL
+        )
+    """)
+    try:
+        for chunk in _chunks(updates, chunk_size):
+            cursor.execute("DELETE FROM email_updates")
+            cursor.executemany(
+                "INSERT OR REPLACE INTO email_updates VALUES (?, ?)", chunk)
+            cursor.execute("""
+                UPDATE users
+                SET email = (SELECT email FROM email_updates
+                             WHERE email_updates.user_id = users.user_id)
+                WHERE user_id IN (SELECT user_id FROM email_updates)
+            """)
+            affected += cursor.rowcount
+    finally:
+        cursor.execute("DROP TABLE IF EXISTS temp.email_updates")
+    return affected
+
 # Update user's email with automatic transaction handling
-# update_user_email(user_id="00000000000000000000000000000001", new_email='Crawford_Cartwright@hotmail.com')
\ No newline at end of file
+# update_user_email(user_id="00000000000000000000000000000001", new_email='Crawford_Cartwright@hotmail.com')
+
+# Apply many corrections in one transaction:
+# bulk_update_user_emails(updates=[("1", "a@example.com"), ("2", "b@example.com")])
+
+# Or group many separate updates into a few commits:
+# with batch_transactions(max_calls=500):
+#     for user_id, email in corrections:
+#         update_user_email(user_id=user_id, new_email=email)
@@ -1,34 +1,131 @@
-import sqlite3
+import asyncio
 import functools
+import inspect
+import random
+import sqlite3
+import threading
 from functools import wraps
 import time
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('db.sqlite3')
-        try:
-            return func(conn, *args, **kwargs)
-        finally:
-            conn.close()
-    return wrapper
-
-def retry_on_failure(retries=3, delay=2):
+from db_connection import with_db_connection
+
+# Transient sqlite3.OperationalError messages; anything else (syntax errors,
+# missing tables, constraint violations) fails immediately.
+RETRYABLE_MESSAGES = (
+    "database is locked",
+    "database table is locked",
+    "database schema has changed",
+    "disk i/o error",
+)
+
+
+def is_retryable(error):
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error).lower()
+        return any(text in message for text in RETRYABLE_MESSAGES)
+    return False
+
+
+def backoff_delay(attempt, base_delay, max_delay):
+    """Full jitter: uniform in [0, min(max_delay, base_delay * 2**attempt)]"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+class RetryBudget:
+    """Process-wide cap on retries relative to successful calls.
+
+    Every success deposits `ratio` tokens, plus `min_per_second` tokens
+    accrue over time; every retry withdraws one. Once the budget is empty,
+    failures are raised at once instead of retried, which stops retry storms
+    from amplifying an outage.
+    """
+
+    def __init__(self, ratio=0.2, min_per_second=1.0, capacity=10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, amount=0.0):
+        now = time.monotonic()
+        earned = (now - self._updated) * self.min_per_second + amount
+        self._tokens = min(self.capacity, self._tokens + earned)
+        self._updated = now
+
+    def record_success(self):
+        with self._lock:
+            self._refill(self.ratio)
+
+    def try_spend(self):
+        with self._lock:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return True
+            return False
+
+
+default_budget = RetryBudget()
+
+
+def retry_on_failure(retries=3, delay=2, max_delay=30, retry_on=is_retryable,
+                     budget=default_budget):
+    """Retry transient failures with exponential backoff and full jitter.
+
+    retries is the total number of attempts and delay the base backoff in
+    seconds. Coroutine functions get an async wrapper that awaits
+    asyncio.sleep instead of blocking.
+    """
+    def should_retry(error, attempt):
+        if not retry_on(error):
+            return False
+        if attempt >= retries:
+            print("[Error] All retries failed.")
+            return False
+        if budget is not None and not budget.try_spend():
+            print("[Error] Retry budget exhausted, not retrying.")
+            return False
+        return True
+
     def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                attempt = 0
+                while True:
+                    try:
+                        result = await func(*args, **kwargs)
+                    except Exception as e:
+                        attempt += 1
+                        if not should_retry(e, attempt):
+                            raise
+                        print(f"[Retry {attempt}/{retries}] Error: {e}")
+                        await asyncio.sleep(
+                            backoff_delay(attempt - 1, delay, max_delay))
+                        continue
+                    if budget is not None:
+                        budget.record_success()
+                    return result
+            return async_wrapper
+
         @functools.wraps(func)
         def wrapper(*args, **kwargs):
             attempt = 0
-            while attempt < retries:
+            while True:
                 try:
-                    return func(*args, **kwargs)
+                    result = func(*args, **kwargs)
                 except Exception as e:
                     attempt += 1
-                    print(f"[Retry {attempt}/{retries}] Error: {e}")
-                    if attempt < retries:
-                        time.sleep(delay)
-                    else:
-                        print("[Error] All retries failed.")
+                    if not should_retry(e, attempt):
                         raise
+                    print(f"[Retry {attempt}/{retries}] Error: {e}")
+                    time.sleep(backoff_delay(attempt - 1, delay, max_delay))
+                    continue
+                if budget is not None:
+                    budget.record_success()
+                return result
         return wrapper
     return decorator
 
@@ -1,30 +1,354 @@
-import sqlite3
+import asyncio
 import functools
+import inspect
+import re
+import threading
+import time
+from collections import OrderedDict
 from functools import wraps
 
+from db_connection import with_db_connection
 
-query_cache = {}
+# Table name after a keyword, skipping an optional schema (main.users)
+TABLE_PATTERN = re.compile(
+    r'\b(?:FROM|JOIN|INTO|UPDATE|TABLE)\s+'
+    r'(?:["`\[]?\w+["`\]]?\.)?["`\[]?(\w+)', re.IGNORECASE)
+WRITE_PATTERN = re.compile(
+    r'^\s*(?:INSERT|UPDATE|DELETE|REPLACE|CREATE|DROP|ALTER)\b', re.IGNORECASE)
+CTE_PATTERN = re.compile(r'^\s*WITH\b', re.IGNORECASE)
+WRITE_KEYWORD = re.compile(r'\b(?:INSERT|UPDATE|DELETE|REPLACE)\b',
+                           re.IGNORECASE)
+
+
+def tables_in(query):
+    return frozenset(name.lower() for name in TABLE_PATTERN.findall(query))
+
+
+def is_write(query):
+    if WRITE_PATTERN.match(query):
+        return True
+    # WITH ... can prefix a write; treat any CTE naming one as a write
+    return bool(CTE_PATTERN.match(query) and WRITE_KEYWORD.search(query))
+
+
+def freeze(value):
+    """Make lists/dicts of bound parameters usable inside a cache key"""
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.items()))
+    return value
+
+
+def database_identity(conn):
+    """Path of the main database file, so caches never mix databases"""
+    return conn.execute("PRAGMA database_list").fetchone()[2]
+
+
+async def adatabase_identity(conn):
+    """database_identity for an aiosqlite connection"""
+    cursor = await conn.execute("PRAGMA database_list")
+    row = await cursor.fetchone()
+    await cursor.close()
+    return row[2]
+
+
+class _Flight:
+    """A load in progress that concurrent callers for the same key wait on"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class QueryCache:
+    """Thread-safe LRU cache with per-entry TTL and table invalidation.
+
+    A ttl of 0 keeps entries until they are evicted or invalidated. For
+    stale_ttl seconds after an entry expires, get_or_load keeps serving it
+    to concurrent callers while one of them refreshes it; that first caller
+    waits for the refresh like any other miss. A load that
+    overlaps an invalidation of one of its tables is returned to its caller
+    but not stored, since it may predate the write. An optional
+    disk tier (a disk_cache.DiskCache) is consulted on memory misses and
+    written through on loads, so results survive restarts. cache_query
+    never loads through the cache inside an open transaction, so neither
+    tier stores a read that a rollback could undo.
+    """
+
+    def __init__(self, maxsize=256, ttl=300, stale_ttl=0, disk=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.disk = disk
+        self._entries = OrderedDict()  # key -> (expires_at, tables, value)
+        self._table_generations = {}  # table -> invalidation count
+        self._flights = {}
+        self._async_flights = {}  # (event loop id, key) -> asyncio.Future
+        self._lock = threading.Lock()
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "disk_hits": 0,
+            "stale_hits": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expirations": 0,
+            "invalidations": 0,
+            "stale_loads": 0,
+        }
+
+    def _lookup(self, key):
+        """Return ("fresh" | "stale" | "miss", value); call under lock"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return "miss", None
+        expires_at, _, value = entry
+        now = time.monotonic()
+        if expires_at is None or now < expires_at:
+            self._entries.move_to_end(key)
+            return "fresh", value
+        if now < expires_at + self.stale_ttl:
+            return "stale", value
+        del self._entries[key]
+        self.stats["expirations"] += 1
+        return "miss", None
+
+    def _generation(self, tables):
+        """Invalidation counts of the given tables; call under lock"""
+        return tuple(self._table_generations.get(table, 0)
+                     for table in sorted(tables))
+
+    def get(self, key):
+        """Return (True, value) on a fresh hit, (False, None) otherwise"""
+        with self._lock:
+            state, value = self._lookup(key)
+            if state == "fresh":
+                self.stats["hits"] += 1
+                return True, value
+            self.stats["misses"] += 1
+            return False, None
+
+    def get_or_load(self, key, loader, tables=frozenset(), ttl=None):
+        """Return (value, from_cache); concurrent misses share one loader()"""
+        with self._lock:
+            state, value = self._lookup(key)
+            if state == "fresh":
+                self.stats["hits"] += 1
+                return value, True
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight()
+                self.stats["misses"] += 1
+                generation = self._generation(tables)
+                leader = True
+            elif state == "stale":
+                self.stats["stale_hits"] += 1
+                return value, True
+            else:
+                self.stats["coalesced"] += 1
+                leader = False
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value, True
 
-def with_db_connection(func):
-    @functools.wraps(func)
-    def wrapper(*args, **kwargs):
-        conn = sqlite3.connect('db.sqlite3')
         try:
-            return func(conn, *args, **kwargs)
+            version = None
+            if self.disk is not None:
+                version = self.disk.version_of(key)
+                hit, value = self.disk.get(key)
+                if hit:
+                    flight.value = value
+                    self._set_from_disk(key, value, tables, ttl, generation)
+                    return value, True
+            flight.value = loader()
+            stored = self.set(key, flight.value, tables, ttl, generation)
+            if stored and self.disk is not None:
+                self.disk.set(key, flight.value, tables, ttl, version)
+            return flight.value, False
+        except BaseException as e:
+            flight.error = e
+            raise
         finally:
-            conn.close()
-    return wrapper
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    async def aget_or_load(self, key, loader, tables=frozenset(), ttl=None):
+        """Async get_or_load; concurrent tasks share one awaited loader()"""
+        flight_key = (id(asyncio.get_running_loop()), key)
+        while True:
+            with self._lock:
+                state, value = self._lookup(key)
+                if state == "fresh":
+                    self.stats["hits"] += 1
+                    return value, True
+                future = self._async_flights.get(flight_key)
+                if future is None:
+                    future = asyncio.get_running_loop().create_future()
+                    self._async_flights[flight_key] = future
+                    self.stats["misses"] += 1
+                    generation = self._generation(tables)
+                    break
+                if state == "stale":
+                    self.stats["stale_hits"] += 1
+                    return value, True
+                self.stats["coalesced"] += 1
+
+            try:
+                # shield: a cancelled waiter must not cancel the shared load
+                return await asyncio.shield(future), True
+            except asyncio.CancelledError:
+                # Only the leader was cancelled, not this task: look again,
+                # and become the new leader if nobody else has
+                task = asyncio.current_task()
+                cancelling = getattr(task, "cancelling", lambda: 0)()
+                if not future.cancelled() or cancelling:
+                    raise
+
+        try:
+            version = None
+            if self.disk is not None:
+                version = self.disk.version_of(key)
+                hit, value = await asyncio.to_thread(self.disk.get, key)
+                if hit:
+                    self._set_from_disk(key, value, tables, ttl, generation)
+                    future.set_result(value)
+                    return value, True
+            value = await loader()
+            stored = self.set(key, value, tables, ttl, generation)
+            if stored and self.disk is not None:
+                await asyncio.to_thread(self.disk.set, key, value, tables,
+                                        ttl, version)
+            future.set_result(value)
+            return value, False
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            future.exception()  # retrieved here, even if nobody waits
+            raise
+        finally:
+            with self._lock:
+                del self._async_flights[flight_key]
+
+    def _set_from_disk(self, key, value, tables, ttl, generation):
+        with self._lock:
+            self.stats["disk_hits"] += 1
+        self.set(key, value, tables, ttl, generation)
+
+    def set(self, key, value, tables=frozenset(), ttl=None, generation=None):
+        """Store value and return True, unless one of tables was invalidated
+        after generation was taken"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if (generation is not None
+                    and generation != self._generation(tables)):
+                self.stats["stale_loads"] += 1
+                return False
+            self._entries[key] = (expires_at, tables, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.stats["evictions"] += 1
+        return True
+
+    def invalidate_tables(self, tables):
+        """Drop every entry that read from any of the given tables"""
+        if isinstance(tables, str):
+            tables = {tables}
+        tables = {table.lower() for table in tables}
+        with self._lock:
+            for table in tables:
+                self._table_generations[table] = (
+                    self._table_generations.get(table, 0) + 1)
+            stale = [key for key, (_, read, _) in self._entries.items()
+                     if read & tables]
+            for key in stale:
+                del self._entries[key]
+            self.stats["invalidations"] += len(stale)
+        if self.disk is not None:
+            self.disk.invalidate_tables(tables)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Pass disk=DiskCache() (from disk_cache) to keep results across restarts
+query_cache = QueryCache()
+
+def cache_query(func=None, *, cache=query_cache, ttl=None):
+    """Cache results keyed on database, query and bound parameters.
+
+    Write statements are never cached; running one invalidates cached reads
+    of the tables it touches. Reads on a connection with an open
+    transaction bypass the cache, since they may see uncommitted writes
+    that are later rolled back. With a cache whose stale_ttl is set, the
+    first call after an entry expires runs the query and waits for it;
+    only calls made while that refresh is running get the stale result.
+    Coroutine functions (taking an aiosqlite connection) are cached the
+    same way without blocking the event loop.
+    """
+    if func is None:
+        return functools.partial(cache_query, cache=cache, ttl=ttl)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(conn, *args, **kwargs):
+            query = kwargs.get('query') or (args[0] if args else '')
+            if is_write(query):
+                try:
+                    return await func(conn, *args, **kwargs)
+                finally:
+                    cache.invalidate_tables(tables_in(query))
+            if conn.in_transaction:
+                return await func(conn, *args, **kwargs)
+
+            params = freeze(args[1:]) + freeze(
+                {k: v for k, v in kwargs.items() if k != 'query'})
+            key = (await adatabase_identity(conn), query, params)
+            async def load():
+                print("[DB] Executing query and caching result")
+                return await func(conn, *args, **kwargs)
+
+            result, from_cache = await cache.aget_or_load(
+                key, load, tables_in(query), ttl)
+            if from_cache:
+                print("[Cache] Returning cached result for query")
+            return result
+        return async_wrapper
 
-def cache_query(func):
     @functools.wraps(func)
     def wrapper(conn, *args, **kwargs):
         query = kwargs.get('query') or (args[0] if args else '')
-        if query in query_cache:
+        if is_write(query):
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                cache.invalidate_tables(tables_in(query))
+        if conn.in_transaction:
+            return func(conn, *args, **kwargs)
+
+        params = freeze(args[1:]) + freeze(
+            {k: v for k, v in kwargs.items() if k != 'query'})
+        key = (database_identity(conn), query, params)
+        def load():
+            print("[DB] Executing query and caching result")
+            return func(conn, *args, **kwargs)
+
+        result, from_cache = cache.get_or_load(key, load, tables_in(query), ttl)
+        if from_cache:
             print("[Cache] Returning cached result for query")
-            return query_cache[query]
-        print("[DB] Executing query and caching result")
-        result = func(conn, *args, **kwargs)
-        query_cache[query] = result
         return result
     return wrapper
 
@@ -39,4 +363,4 @@ def fetch_users_with_cache(conn, query):
 users = fetch_users_with_cache(query="SELECT * FROM users")
 
 #### Second call will use the cached result
-users_again = fetch_users_with_cache(query="SELECT * FROM users") 
+users_again = fetch_users_with_cache(query="SELECT * FROM users")
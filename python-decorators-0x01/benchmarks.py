@@ -0,0 +1,68 @@
+import os
+import sqlite3
+import sys
+import tempfile
+import timeit
+
+from db_connection import close_connections, with_db_connection
+
+QUERY = "SELECT * FROM users WHERE user_id = ?"
+
+
+def seed(db_path, rows=1000):
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     [(str(i), f"User {i}", f"user{i}@example.com", 30)
+                      for i in range(rows)])
+    conn.commit()
+    conn.close()
+
+
+def bench_get_user_by_id(calls=20000):
+    """Per-call cost of get_user_by_id with and without each cache.
+
+    Both cached-connection cases open a plain cursor per call, so the gap
+    between them is the prepared-statement cache alone, and the gap to
+    connect per call is connection reuse.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.sqlite3")
+        seed(db_path)
+
+        def connect_per_call(user_id):
+            # The original decorator: fresh connection and cursor every call
+            conn = sqlite3.connect(db_path)
+            try:
+                cursor = conn.cursor()
+                cursor.execute(QUERY, (user_id,))
+                return cursor.fetchone()
+            finally:
+                conn.close()
+
+        def get_user_by_id(conn, user_id):
+            cursor = conn.cursor()
+            cursor.execute(QUERY, (user_id,))
+            return cursor.fetchone()
+
+        # A second path to the same file gets its own thread-cached
+        # connection, opened without a statement cache
+        uncached_path = os.path.join(tmp, ".", "bench.sqlite3")
+        no_statement_cache = with_db_connection(
+            get_user_by_id, db_path=uncached_path, cached_statements=0)
+        statement_cache = with_db_connection(get_user_by_id, db_path=db_path)
+
+        results = {}
+        for name, func in (("connect per call", connect_per_call),
+                           ("cached connection", no_statement_cache),
+                           ("+ statement cache", statement_cache)):
+            seconds = timeit.timeit(lambda: func("500"), number=calls)
+            results[name] = seconds / calls * 1e6
+            print(f"{name:<18} {results[name]:8.2f} us/call")
+        close_connections()
+    return results
+
+
+if __name__ == "__main__":
+    bench_get_user_by_id(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
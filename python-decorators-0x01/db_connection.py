@@ -0,0 +1,137 @@
+import sqlite3
+import functools
+import inspect
+import threading
+from contextlib import contextmanager
+
+try:
+    import aiosqlite
+except ImportError:  # only needed to decorate coroutine functions
+    aiosqlite = None
+
+DEFAULT_DB_PATH = 'db.sqlite3'
+
+# Prepared statements sqlite3 keeps per connection (its own default is 128)
+CACHED_STATEMENTS = 256
+
+_local = threading.local()
+
+
+def connect(db_path=DEFAULT_DB_PATH, cached_statements=CACHED_STATEMENTS):
+    return sqlite3.connect(db_path, cached_statements=cached_statements)
+
+
+def _thread_state():
+    if not hasattr(_local, 'connections'):
+        _local.connections = {}
+        _local.depth = {}
+    return _local.connections, _local.depth
+
+
+def get_connection(db_path=DEFAULT_DB_PATH,
+                   cached_statements=CACHED_STATEMENTS):
+    """Return this thread's cached connection to db_path, opening it once"""
+    connections, _ = _thread_state()
+    conn = connections.get(db_path)
+    if conn is None:
+        conn = connections[db_path] = connect(db_path, cached_statements)
+    return conn
+
+
+def close_connections():
+    """Close every connection cached for the calling thread"""
+    connections = getattr(_local, 'connections', {})
+    while connections:
+        _, conn = connections.popitem()
+        conn.close()
+
+
+def _enter_scope(db_path, cached_statements):
+    conn = get_connection(db_path, cached_statements)
+    depth = _local.depth
+    depth[db_path] = depth.get(db_path, 0) + 1
+    return conn
+
+
+def _exit_scope(db_path, conn):
+    depth = _local.depth
+    depth[db_path] -= 1
+    # Nested scopes share the connection; only the outermost one may
+    # discard an open transaction.
+    if depth[db_path] == 0 and conn.in_transaction:
+        conn.rollback()
+
+
+@contextmanager
+def connection_scope(db_path=DEFAULT_DB_PATH,
+                     cached_statements=CACHED_STATEMENTS):
+    """Hold this thread's cached connection for the length of a block.
+
+    Decorated calls made inside the block see a nested scope, so work they
+    leave open is kept until the outermost scope exits and rolls it back.
+    """
+    conn = _enter_scope(db_path, cached_statements)
+    try:
+        yield conn
+    finally:
+        _exit_scope(db_path, conn)
+
+
+def _without_connection(func):
+    """func's signature minus the connection argument the wrapper supplies"""
+    signature = inspect.signature(func)
+    params = list(signature.parameters.values())
+    if params and params[0].kind in (params[0].POSITIONAL_ONLY,
+                                     params[0].POSITIONAL_OR_KEYWORD):
+        params = params[1:]
+    return signature.replace(parameters=params)
+
+
+def with_db_connection(func=None, *, db_path=DEFAULT_DB_PATH, reuse=True,
+                       cached_statements=CACHED_STATEMENTS):
+    """Pass a connection as the first argument of the decorated function.
+
+    By default the connection is the calling thread's cached one, so hot
+    loops skip connect/close. Work left uncommitted when the call returns
+    is rolled back, as closing a fresh connection would have done. Use
+    reuse=False to get a new connection per call. Each connection keeps
+    up to cached_statements prepared statements, so repeated queries skip
+    parsing even when every call opens its own cursor.
+
+    Coroutine functions get their own aiosqlite connection per call
+    instead, since concurrent tasks must not share one transaction.
+    """
+    if func is None:
+        return functools.partial(with_db_connection, db_path=db_path,
+                                 reuse=reuse,
+                                 cached_statements=cached_statements)
+
+    if inspect.iscoroutinefunction(func):
+        if aiosqlite is None:
+            raise ImportError("aiosqlite is required for async functions")
+
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            async with aiosqlite.connect(
+                    db_path, cached_statements=cached_statements) as conn:
+                return await func(conn, *args, **kwargs)
+        async_wrapper.__signature__ = _without_connection(func)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not reuse:
+            conn = connect(db_path, cached_statements)
+            try:
+                return func(conn, *args, **kwargs)
+            finally:
+                conn.close()
+
+        # Same as connection_scope, minus the generator overhead per call
+        conn = _enter_scope(db_path, cached_statements)
+        try:
+            return func(conn, *args, **kwargs)
+        finally:
+            _exit_scope(db_path, conn)
+    wrapper.__signature__ = _without_connection(func)
+    return wrapper
@@ -0,0 +1,171 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import zlib
+
+# Pickles larger than this are zlib-compressed before they are stored
+COMPRESS_MIN_BYTES = 1024
+
+
+def data_version(db_path):
+    """Token that changes with every commit to the SQLite file at db_path.
+
+    Rollback-journal databases bump the change counter in their header on
+    each commit. WAL databases don't, so their token also takes the change
+    counter, frame count and salts from the wal-index header in the -shm
+    file. Returns None, making results uncacheable, for in-memory or
+    missing databases and for WAL databases with no open connection.
+    """
+    try:
+        with open(db_path, 'rb') as f:
+            header = f.read(100)
+    except (OSError, ValueError):
+        return None
+    if len(header) < 100 or not header.startswith(b'SQLite format 3\0'):
+        return None
+    counter = int.from_bytes(header[24:28], 'big')
+    if header[18] != 2:  # file format write version 2 means WAL
+        return f"c{counter}"
+    for _ in range(3):
+        try:
+            with open(f"{db_path}-shm", 'rb') as f:
+                index = f.read(96)
+        except OSError:
+            return None
+        # The header is stored twice; differing copies mean a write is in
+        # progress, so read again
+        if len(index) == 96 and index[:48] == index[48:]:
+            return (f"w{counter}:{index[8:12].hex()}:{index[16:20].hex()}:"
+                    f"{index[32:40].hex()}")
+    return None
+
+
+class DiskCache:
+    """Result cache in a local SQLite file, shared by processes on a host.
+
+    Entries are keyed by a hash of the cache key and stamped with the data
+    version of the source database, so any write to that database makes
+    them unreachable. The file is kept under max_bytes by dropping the
+    least recently read entries.
+
+    Values are pickled, so anyone able to write the cache file can run code
+    in every process that reads it. A new file is created readable by its
+    owner only; keep path out of shared or world-writable directories.
+    """
+
+    def __init__(self, path='.query_cache.sqlite3', max_bytes=64 * 2**20,
+                 ttl=3600):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._local = threading.local()
+        # SQLite gives the -wal and -shm files the same permissions
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                key TEXT PRIMARY KEY,
+                version TEXT NOT NULL,
+                tables TEXT NOT NULL,
+                expires_at REAL,
+                accessed REAL NOT NULL,
+                compressed INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                value BLOB NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed "
+                     "ON entries (accessed)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5,
+                                   isolation_level=None)
+            # WAL lets worker processes read while another one writes
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _hash(key):
+        # repr, not pickle: pickle output depends on object identity, so
+        # equal keys could hash differently
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """Return (True, value) for a current entry, (False, None) otherwise"""
+        version = data_version(key[0])
+        if version is None:
+            return False, None
+        digest = self._hash(key)
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT version, expires_at, compressed, value FROM entries "
+            "WHERE key = ?", (digest,)).fetchone()
+        if row is None:
+            return False, None
+        stored_version, expires_at, compressed, blob = row
+        if stored_version != version or (
+                expires_at is not None and time.time() >= expires_at):
+            conn.execute("DELETE FROM entries WHERE key = ?", (digest,))
+            return False, None
+        conn.execute("UPDATE entries SET accessed = ? WHERE key = ?",
+                     (time.time(), digest))
+        if compressed:
+            blob = zlib.decompress(blob)
+        return True, pickle.loads(blob)
+
+    def version_of(self, key):
+        """Data version to stamp on a result; read it before the query runs"""
+        return data_version(key[0])
+
+    def set(self, key, value, tables=frozenset(), ttl=None, version=None):
+        if version is None:
+            version = data_version(key[0])
+        if version is None:
+            return
+        blob = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        compressed = len(blob) >= COMPRESS_MIN_BYTES
+        if compressed:
+            blob = zlib.compress(blob)
+        if len(blob) > self.max_bytes:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (self._hash(key), version, f",{','.join(sorted(tables))},",
+             now + ttl if ttl else None, now, int(compressed), len(blob),
+             blob))
+        self._enforce_size()
+
+    def _enforce_size(self):
+        conn = self._conn()
+        total = conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        while total > self.max_bytes:
+            oldest = conn.execute(
+                "SELECT key, size FROM entries ORDER BY accessed LIMIT 64"
+            ).fetchall()
+            if not oldest:
+                break
+            for digest, size in oldest:
+                conn.execute("DELETE FROM entries WHERE key = ?", (digest,))
+                total -= size
+                if total <= self.max_bytes:
+                    break
+
+    def invalidate_tables(self, tables):
+        conn = self._conn()
+        for table in tables:
+            conn.execute("DELETE FROM entries WHERE instr(tables, ?) > 0",
+                         (f",{table.lower()},",))
+
+    def clear(self):
+        self._conn().execute("DELETE FROM entries")
@@ -0,0 +1,191 @@
+import functools
+import inspect
+import math
+import re
+import threading
+import time
+
+# Latency buckets grow by 5%, so reported percentiles are within 5% of the
+# true value while each fingerprint keeps only a few dozen counters.
+BUCKET_GROWTH = 1.05
+_LOG_GROWTH = math.log(BUCKET_GROWTH)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def fingerprint(query):
+    """Normalize literals so queries differing only in values aggregate"""
+    query = _STRING_LITERAL.sub("?", query)
+    query = _NUMBER_LITERAL.sub("?", query)
+    query = _IN_LIST.sub("(?+)", query)
+    return _WHITESPACE.sub(" ", query).strip()
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (microsecond resolution)"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+
+    def add(self, seconds):
+        micros = max(seconds * 1e6, 1.0)
+        index = int(math.log(micros) / _LOG_GROWTH)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in ms"""
+        if not self.count:
+            return None
+        rank = max(1, math.ceil(p / 100 * self.count))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= rank:
+                return BUCKET_GROWTH ** (index + 1) / 1000
+        return None
+
+
+class QueryStats:
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_seconds = 0.0
+        self.histogram = LatencyHistogram()
+
+    def snapshot(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "rows": self.rows,
+            "mean_ms": self.total_seconds / self.calls * 1000
+            if self.calls else None,
+            "p50_ms": self.histogram.percentile(50),
+            "p95_ms": self.histogram.percentile(95),
+            "p99_ms": self.histogram.percentile(99),
+        }
+
+
+class QueryProfiler:
+    """Thread-safe latency, row count and error counters per query key"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def record(self, key, seconds, rows=None, error=False):
+        with self._lock:
+            stats = self._stats.get(key)
+            if stats is None:
+                stats = self._stats[key] = QueryStats()
+            stats.calls += 1
+            stats.total_seconds += seconds
+            stats.histogram.add(seconds)
+            if error:
+                stats.errors += 1
+            if rows:
+                stats.rows += rows
+
+    def snapshot(self):
+        """Counters for every fingerprint, as plain dicts"""
+        with self._lock:
+            return {key: stats.snapshot()
+                    for key, stats in self._stats.items()}
+
+    def report(self):
+        """Text table sorted by total time spent, slowest first"""
+        with self._lock:
+            items = sorted(self._stats.items(),
+                           key=lambda item: item[1].total_seconds,
+                           reverse=True)
+            lines = [f"{'calls':>7} {'err%':>6} {'p50ms':>9} {'p95ms':>9} "
+                     f"{'p99ms':>9} {'rows':>9}  query"]
+            for key, stats in items:
+                snap = stats.snapshot()
+                lines.append(
+                    f"{snap['calls']:>7} {snap['error_rate'] * 100:>6.1f} "
+                    f"{snap['p50_ms']:>9.3f} {snap['p95_ms']:>9.3f} "
+                    f"{snap['p99_ms']:>9.3f} {snap['rows']:>9}  {key}")
+        return "\n".join(lines)
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+default_profiler = QueryProfiler()
+
+
+def _query_key(func, sql_arg):
+    """Build the key function for func's calls.
+
+    The key is func's qualname plus the fingerprint of its SQL, taken from
+    the sql_arg keyword or the parameter of that name; calls without SQL
+    are keyed by the qualname alone, never by other argument values.
+    Pass-through decorators are unwrapped to find the parameter, and
+    with_db_connection reports its signature without the connection.
+    """
+    name = func.__qualname__
+    params = list(inspect.signature(func).parameters)
+    index = params.index(sql_arg) if sql_arg in params else None
+
+    def key(args, kwargs):
+        query = kwargs.get(sql_arg)
+        if query is None and index is not None and index < len(args):
+            query = args[index]
+        if not isinstance(query, str):
+            return name
+        return f"{name}: {fingerprint(query)}"
+    return key
+
+
+def profile_queries(func=None, *, profiler=default_profiler, sql_arg='query'):
+    """Record latency, rows returned and errors per function and query.
+
+    Works above or below with_db_connection, transactional and
+    cache_query; placed above cache_query it also times cache hits.
+    Coroutine functions are timed until their result is ready. sql_arg
+    names the argument carrying the SQL text.
+    """
+    if func is None:
+        return functools.partial(profile_queries, profiler=profiler,
+                                 sql_arg=sql_arg)
+    query_key = _query_key(func, sql_arg)
+
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = await func(*args, **kwargs)
+            except Exception:
+                profiler.record(query_key(args, kwargs),
+                                time.perf_counter() - start, error=True)
+                raise
+            profiler.record(query_key(args, kwargs),
+                            time.perf_counter() - start,
+                            rows=len(result) if isinstance(result, list)
+                            else None)
+            return result
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = func(*args, **kwargs)
+        except Exception:
+            profiler.record(query_key(args, kwargs),
+                            time.perf_counter() - start, error=True)
+            raise
+        profiler.record(query_key(args, kwargs),
+                        time.perf_counter() - start,
+                        rows=len(result) if isinstance(result, list) else None)
+        return result
+    return wrapper
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+"""
+Unit tests for QueryCache and the cache_query decorator in 4-cache_query.py.
+"""
+
+import asyncio
+import importlib.util
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+from db_connection import close_connections, connection_scope, with_db_connection
+from disk_cache import DiskCache
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def seed_users(db_path: str) -> None:
+    """Create a users table holding two rows."""
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE users (user_id TEXT PRIMARY KEY, name TEXT, "
+                 "email TEXT, age INTEGER)")
+    conn.executemany("INSERT INTO users VALUES (?, ?, ?, ?)",
+                     [("1", "Ann", "ann@example.com", 30),
+                      ("2", "Bob", "bob@example.com", 40)])
+    conn.commit()
+    conn.close()
+
+
+def import_cache_module():
+    """Import 4-cache_query from a scratch directory.
+
+    The module runs its example queries against ./db.sqlite3 on import.
+    """
+    cwd = os.getcwd()
+    scratch = tempfile.mkdtemp()
+    try:
+        os.chdir(scratch)
+        seed_users("db.sqlite3")
+        spec = importlib.util.spec_from_file_location(
+            "cache_query_module", os.path.join(HERE, "4-cache_query.py"))
+        module = importlib.util.module_from_spec(spec)
+        with patch('builtins.print'):
+            spec.loader.exec_module(module)
+        close_connections()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(scratch)
+    return module
+
+
+cache_module = import_cache_module()
+QueryCache = cache_module.QueryCache
+cache_query = cache_module.cache_query
+is_write = cache_module.is_write
+tables_in = cache_module.tables_in
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Base class with a seeded scratch database and a fresh cache."""
+
+    def setUp(self) -> None:
+        """Seed a database, start an empty cache and silence prints."""
+        scratch = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, scratch)
+        self.db_path = os.path.join(scratch, "users.sqlite3")
+        seed_users(self.db_path)
+        self.addCleanup(close_connections)
+        self.cache = QueryCache()
+        printer = patch('builtins.print')
+        printer.start()
+        self.addCleanup(printer.stop)
+
+    def cached_fetch(self, commit: bool = True):
+        """A cache_query function that optionally commits what it runs."""
+        @with_db_connection(db_path=self.db_path)
+        @cache_query(cache=self.cache)
+        def fetch(conn, query):
+            cursor = conn.cursor()
+            cursor.execute(query)
+            rows = cursor.fetchall()
+            if commit:
+                conn.commit()
+            return rows
+        return fetch
+
+
+class TestStatementParsing(unittest.TestCase):
+    """Tests for is_write and tables_in."""
+
+    def test_cte_write_is_write(self) -> None:
+        """A write behind a WITH clause is still a write."""
+        self.assertTrue(is_write(
+            "WITH t AS (SELECT 1) UPDATE users SET age = age + 1"))
+        self.assertFalse(is_write(
+            "WITH t AS (SELECT 1) SELECT * FROM t JOIN users"))
+
+    def test_schema_qualified_table(self) -> None:
+        """schema.table names record the table, not the schema."""
+        self.assertEqual(tables_in("SELECT * FROM main.users"),
+                         frozenset({"users"}))
+        self.assertEqual(tables_in('UPDATE "main"."users" SET age = 1'),
+                         frozenset({"users"}))
+
+
+class TestCacheQuery(DatabaseTestCase):
+    """Tests for the cache_query decorator."""
+
+    def test_caches_reads(self) -> None:
+        """A repeated read is served from the cache."""
+        fetch = self.cached_fetch()
+        first = fetch(query="SELECT * FROM users")
+        self.assertEqual(fetch(query="SELECT * FROM users"), first)
+        self.assertEqual(self.cache.stats["hits"], 1)
+
+    def test_cte_write_runs_every_time(self) -> None:
+        """A CTE-prefixed UPDATE is never answered from the cache."""
+        fetch = self.cached_fetch()
+        query = ("WITH t AS (SELECT '1' AS id) "
+                 "UPDATE users SET age = age + 1 "
+                 "WHERE user_id IN (SELECT id FROM t)")
+        fetch(query=query)
+        fetch(query=query)
+        age = fetch(query="SELECT age FROM users WHERE user_id = '1'")
+        self.assertEqual(age, [(32,)])
+        self.assertEqual(self.cache.stats["hits"], 0)
+
+    def test_schema_qualified_write_invalidates(self) -> None:
+        """Writing main.users drops cached reads of users."""
+        fetch = self.cached_fetch()
+        fetch(query="SELECT name FROM users WHERE user_id = '1'")
+        fetch(query="UPDATE main.users SET name = 'Eve' WHERE user_id = '1'")
+        self.assertEqual(
+            fetch(query="SELECT name FROM users WHERE user_id = '1'"),
+            [("Eve",)])
+
+    def test_open_transaction_bypasses_cache(self) -> None:
+        """Reads that may see uncommitted writes are never stored."""
+        fetch = self.cached_fetch(commit=False)
+        query = "SELECT name FROM users WHERE user_id = '1'"
+        with connection_scope(self.db_path) as conn:
+            conn.execute("UPDATE users SET name = 'uncommitted' "
+                         "WHERE user_id = '1'")
+            self.assertEqual(fetch(query=query), [("uncommitted",)])
+            self.assertEqual(len(self.cache), 0)
+        # Leaving the scope rolled the update back
+        self.assertEqual(fetch(query=query), [("Ann",)])
+
+
+class TestDiskTier(DatabaseTestCase):
+    """Tests for cache_query with a DiskCache behind the memory tier."""
+
+    def setUp(self) -> None:
+        """Put a DiskCache file next to the scratch database."""
+        super().setUp()
+        self.disk = DiskCache(os.path.join(os.path.dirname(self.db_path),
+                                           "cache.sqlite3"))
+        self.addCleanup(self.disk._conn().close)
+        self.cache = QueryCache(disk=self.disk)
+
+    def test_restart_serves_disk_entry(self) -> None:
+        """A fresh QueryCache reads a committed result from disk."""
+        self.cached_fetch()(query="SELECT * FROM users")
+        self.cache = QueryCache(disk=self.disk)
+        self.cached_fetch()(query="SELECT * FROM users")
+        self.assertEqual(self.cache.stats["disk_hits"], 1)
+
+    def test_rolled_back_read_not_written_through(self) -> None:
+        """A read of uncommitted data never reaches the disk tier."""
+        query = "SELECT name FROM users WHERE user_id = '1'"
+        with connection_scope(self.db_path) as conn:
+            conn.execute("UPDATE users SET name = 'uncommitted' "
+                         "WHERE user_id = '1'")
+            self.assertEqual(self.cached_fetch(commit=False)(query=query),
+                             [("uncommitted",)])
+        count = self.disk._conn().execute(
+            "SELECT COUNT(*) FROM entries").fetchone()[0]
+        self.assertEqual(count, 0)
+
+        # A restarted process must see the committed row
+        self.cache = QueryCache(disk=self.disk)
+        self.assertEqual(self.cached_fetch()(query=query), [("Ann",)])
+        self.assertEqual(self.cache.stats["disk_hits"], 0)
+
+
+def wait_for(condition, timeout: float = 5.0) -> None:
+    """Poll condition until it holds, failing after timeout seconds."""
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.001)
+
+
+class TestGetOrLoad(unittest.TestCase):
+    """Tests for QueryCache.get_or_load across threads."""
+
+    def setUp(self) -> None:
+        """Start every test with an empty cache."""
+        self.cache = QueryCache()
+
+    def run_callers(self, count: int, loader) -> tuple:
+        """Call get_or_load("k", loader) from count threads at once.
+
+        loader should block until the test lets it finish. Returns the
+        started threads and a list each fills with its value or error.
+        """
+        outcomes = []
+
+        def call():
+            try:
+                outcomes.append(self.cache.get_or_load("k", loader))
+            except Exception as e:
+                outcomes.append(e)
+
+        threads = [threading.Thread(target=call) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        return threads, outcomes
+
+    def test_single_flight(self) -> None:
+        """Concurrent misses for one key run the loader once."""
+        release = threading.Event()
+        calls = []
+
+        def loader():
+            calls.append(1)
+            release.wait()
+            return "value"
+
+        threads, outcomes = self.run_callers(5, loader)
+        wait_for(lambda: self.cache.stats["coalesced"] == 4)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(outcomes, key=lambda o: o[1]),
+                         [("value", False)] + [("value", True)] * 4)
+
+    def test_error_reaches_waiters(self) -> None:
+        """A failing load raises in the leader and every waiter."""
+        release = threading.Event()
+
+        def loader():
+            release.wait()
+            raise RuntimeError("boom")
+
+        threads, outcomes = self.run_callers(3, loader)
+        wait_for(lambda: self.cache.stats["coalesced"] == 2)
+        release.set()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(outcomes), 3)
+        for outcome in outcomes:
+            self.assertIsInstance(outcome, RuntimeError)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_stale_while_revalidate(self) -> None:
+        """While one caller refreshes, others get the expired value."""
+        self.cache = QueryCache(ttl=60, stale_ttl=60)
+        self.cache.set("k", "old")
+        _, tables, value = self.cache._entries["k"]
+        self.cache._entries["k"] = (time.monotonic() - 1, tables, value)
+
+        release = threading.Event()
+
+        def loader():
+            release.wait()
+            return "new"
+
+        threads, outcomes = self.run_callers(1, loader)
+        wait_for(lambda: self.cache.stats["misses"] == 1)
+        self.assertEqual(self.cache.get_or_load("k", loader), ("old", True))
+        self.assertEqual(self.cache.stats["stale_hits"], 1)
+        release.set()
+        threads[0].join()
+        self.assertEqual(outcomes, [("new", False)])
+        self.assertEqual(self.cache.get("k"), (True, "new"))
+
+    def test_invalidation_during_load(self) -> None:
+        """A load that overlaps a write to its table isn't stored."""
+        def loader():
+            self.cache.invalidate_tables({"users"})
+            return "old rows"
+
+        self.assertEqual(
+            self.cache.get_or_load("k", loader, frozenset({"users"})),
+            ("old rows", False))
+        self.assertEqual(len(self.cache), 0)
+        self.assertEqual(self.cache.stats["stale_loads"], 1)
+
+
+class TestAsyncGetOrLoad(unittest.IsolatedAsyncioTestCase):
+    """Tests for QueryCache.aget_or_load."""
+
+    async def test_single_flight(self) -> None:
+        """Concurrent tasks for one key await a single loader."""
+        cache = QueryCache()
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return "value"
+
+        results = await asyncio.gather(
+            *(cache.aget_or_load("k", loader) for _ in range(5)))
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sorted(results, key=lambda r: r[1]),
+                         [("value", False)] + [("value", True)] * 4)
+
+    async def test_waiter_takes_over_cancelled_load(self) -> None:
+        """Cancelling the leader hands the load to a waiting task."""
+        cache = QueryCache()
+        started = asyncio.Event()
+
+        async def slow_loader():
+            started.set()
+            await asyncio.sleep(60)
+
+        async def loader():
+            return "value"
+
+        leader = asyncio.create_task(cache.aget_or_load("k", slow_loader))
+        await started.wait()
+        waiter = asyncio.create_task(cache.aget_or_load("k", loader))
+        await asyncio.sleep(0)
+        self.assertEqual(cache.stats["coalesced"], 1)
+        leader.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await leader
+        self.assertEqual(await waiter, ("value", False))
+        self.assertEqual(cache.get("k"), (True, "value"))
@@ -1,18 +1,49 @@
-from seed import connect_to_prodev
+from collections import namedtuple
 
-def stream_users():
+from seed import connect_to_prodev, USER_COLUMNS
+
+DEFAULT_FETCH_SIZE = 1000
+
+UserRow = namedtuple("UserRow", USER_COLUMNS)
+
+
+def stream_user_rows(fetch_size=DEFAULT_FETCH_SIZE, as_namedtuple=False):
+    """Stream user_data as plain tuples (or UserRow) in constant memory.
+
+    The cursor is unbuffered, so the server sends rows as they are read and
+    at most fetch_size of them are held client-side at any time.
+    """
     conn = connect_to_prodev()
+    cursor = None
+    exhausted = False
     try:
-        cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data")
-        
-        for row in cursor:
-            yield row
+        cursor = conn.cursor(buffered=False)
+        cursor.execute(f"SELECT {', '.join(USER_COLUMNS)} FROM user_data")
+
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            if as_namedtuple:
+                yield from map(UserRow._make, rows)
+            else:
+                yield from rows
+        exhausted = True
 
     except Exception as e:
         print(f"Error streaming users: {e}")
     finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+        if exhausted:
+            if cursor:
+                cursor.close()
+            if conn.is_connected():
+                conn.close()
+        else:
+            # Closing normally would drain the remaining result set first;
+            # drop the socket instead when the consumer stopped early.
+            conn.shutdown()
+
+
+def stream_users(fetch_size=DEFAULT_FETCH_SIZE):
+    for row in stream_user_rows(fetch_size):
+        yield dict(zip(USER_COLUMNS, row))
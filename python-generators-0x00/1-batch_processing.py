@@ -1,32 +1,67 @@
-from seed import connect_to_prodev
+from seed import connect_to_prodev, USER_COLUMNS
 
-def stream_users_in_batches(batch_size):
+
+def stream_users_in_batches(batch_size, min_age=None):
+    """Yield lists of up to batch_size users, optionally filtered in SQL"""
     conn = connect_to_prodev()
+    cursor = None
+    exhausted = False
     try:
         cursor = conn.cursor(dictionary=True)
-        cursor.execute("SELECT * FROM user_data")
-
-        batch = []
-        for row in cursor:
-            batch.append(row)
-            if len(batch) == batch_size:
-                yield batch
-                batch = []
+        query = f"SELECT {', '.join(USER_COLUMNS)} FROM user_data"
+        if min_age is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(f"{query} WHERE age > %s", (min_age,))
 
-        # Yield any remaining users
-        if batch:
+        while True:
+            batch = cursor.fetchmany(batch_size)
+            if not batch:
+                break
             yield batch
+        exhausted = True
 
     except Exception as e:
         print(f"Error streaming batches: {e}")
     finally:
-        if cursor:
-            cursor.close()
-        if conn and conn.is_connected():
-            conn.close()
+        if exhausted:
+            if cursor:
+                cursor.close()
+            if conn.is_connected():
+                conn.close()
+        else:
+            # Avoid draining the unread result set when stopped early
+            conn.shutdown()
+
+
+def filter_stage(predicate):
+    """Pipeline stage that keeps rows for which predicate(row) is true"""
+    def stage(rows):
+        return (row for row in rows if predicate(row))
+    return stage
+
+
+def map_stage(transform):
+    """Pipeline stage that replaces each row with transform(row)"""
+    def stage(rows):
+        return (transform(row) for row in rows)
+    return stage
+
+
+def run_pipeline(rows, stages):
+    """Chain stages lazily; nothing is evaluated until the result is read"""
+    for stage in stages:
+        rows = stage(rows)
+    return rows
+
 
+def batch_processing(batch_size, min_age=25, stages=()):
+    """Yield every non-empty batch of users older than min_age.
 
-def batch_processing(batch_size):
-    for batch in stream_users_in_batches(batch_size):
-        filtered = [user for user in batch if int(user['age']) > 25]
-        return filtered
+    The age predicate runs in SQL; extra stages run on each batch as a
+    chain of generators, so only the final batch list is materialized.
+    """
+    for batch in stream_users_in_batches(batch_size, min_age):
+        processed = list(run_pipeline(batch, stages))
+        if processed:
+            yield processed
@@ -1,29 +1,162 @@
-from seed import connect_to_prodev
+import base64
+import json
+import queue
+import threading
 
-def paginate_users(page_size, offset):
+from seed import connect_to_prodev, USER_COLUMNS
 
-    conn = connect_to_prodev()
+# Columns that are both indexed and unique, so seeking past the last seen
+# value never skips or repeats a row.
+KEYSET_COLUMNS = ("user_id", "email")
+
+_DONE = object()
+
+_SELECT_USERS = f"SELECT {', '.join(USER_COLUMNS)} FROM user_data"
+
+
+def _fetch_page(conn, query, params, caller):
+    """Run a page query, on conn if given or on a one-off connection"""
+    owns_conn = conn is None
+    if owns_conn:
+        conn = connect_to_prodev()
+    cursor = None
     try:
         cursor = conn.cursor(dictionary=True)
-        query = "SELECT * FROM user_data LIMIT %s OFFSET %s"
-        cursor.execute(query, (page_size, offset))
-        results = cursor.fetchall()
-        return results
+        cursor.execute(query, params)
+        return cursor.fetchall()
     except Exception as e:
-        print(f"Error in paginate_users: {e}")
+        print(f"Error in {caller}: {e}")
         return []
     finally:
         if cursor:
             cursor.close()
-        if conn and conn.is_connected():
+        if owns_conn and conn.is_connected():
+            conn.close()
+
+
+def paginate_users(page_size, offset, conn=None):
+    query = f"{_SELECT_USERS} LIMIT %s OFFSET %s"
+    return _fetch_page(conn, query, (page_size, offset), "paginate_users")
+
+
+def paginate_users_after(page_size, last_key=None, order_by="user_id",
+                         conn=None):
+    """Fetch the page that follows last_key by seeking on an indexed column"""
+    if order_by not in KEYSET_COLUMNS:
+        raise ValueError(f"Cannot seek on column: {order_by}")
+
+    if last_key is None:
+        query = f"{_SELECT_USERS} ORDER BY {order_by} LIMIT %s"
+        params = (page_size,)
+    else:
+        query = (
+            f"{_SELECT_USERS} WHERE {order_by} > %s "
+            f"ORDER BY {order_by} LIMIT %s"
+        )
+        params = (last_key, page_size)
+    return _fetch_page(conn, query, params, "paginate_users_after")
+
+
+def encode_cursor(last_key, order_by="user_id"):
+    """Serialize a seek position into an opaque, URL-safe token"""
+    payload = json.dumps({"order_by": order_by, "after": str(last_key)})
+    return base64.urlsafe_b64encode(payload.encode()).decode()
+
+
+def decode_cursor(token, order_by="user_id"):
+    """Return the last seen key stored in a token produced by encode_cursor"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+        after = payload["after"]
+        token_order = payload["order_by"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f"Invalid pagination cursor: {e}") from e
+    if token_order != order_by:
+        raise ValueError(
+            f"Cursor was issued for {token_order}, not {order_by}"
+        )
+    return after
+
+
+def page_cursor(page, order_by="user_id"):
+    """Token that resumes a keyset crawl right after the given page"""
+    return encode_cursor(page[-1][order_by], order_by)
+
+
+def _iter_pages(page_size, keyset, last_key, order_by):
+    # One connection serves the whole crawl; the finally block also runs on
+    # GeneratorExit when a consumer stops early or the generator is closed.
+    conn = connect_to_prodev()
+    try:
+        offset = 0
+        while True:
+            if keyset:
+                page = paginate_users_after(page_size, last_key, order_by,
+                                            conn=conn)
+            else:
+                page = paginate_users(page_size, offset, conn=conn)
+            if not page:
+                break
+            yield page
+            if keyset:
+                if len(page) < page_size:
+                    break
+                last_key = page[-1][order_by]
+            else:
+                offset += page_size
+    finally:
+        if conn.is_connected():
             conn.close()
 
 
-def lazy_paginate(page_size):
-    offset = 0
-    while True:
-        page = paginate_users(page_size, offset)
-        if not page:
-            break
-        yield page
-        offset += page_size
+def _read_ahead(pages, prefetch):
+    """Fetch up to `prefetch` pages ahead in a background thread"""
+    buffer = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item):
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def fetch():
+        try:
+            for page in pages:
+                if not put(page):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            # Includes the SystemExit connect_to_prodev raises when it
+            # cannot connect; the consumer must see it or it waits forever
+            put(e)
+        finally:
+            pages.close()
+
+    worker = threading.Thread(target=fetch, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        worker.join()
+
+
+def lazy_paginate(page_size, keyset=False, cursor=None, order_by="user_id",
+                  prefetch=0):
+    if cursor and not keyset:
+        raise ValueError("A pagination cursor requires keyset=True")
+    last_key = decode_cursor(cursor, order_by) if cursor else None
+    pages = _iter_pages(page_size, keyset, last_key, order_by)
+    if prefetch > 0:
+        pages = _read_ahead(pages, prefetch)
+    yield from pages
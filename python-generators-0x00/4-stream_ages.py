@@ -1,35 +1,149 @@
+import math
+from collections import Counter
+
 from seed import connect_to_prodev
 
+DEFAULT_PERCENTILES = (50, 90, 99)
+
+
 def stream_user_ages():
     conn = connect_to_prodev()
+    cursor = None
+    exhausted = False
     try:
         cursor = conn.cursor()
         cursor.execute("SELECT age FROM user_data")
 
         for (age,) in cursor:
             yield int(age)
+        exhausted = True
 
     except Exception as e:
         print(f"Error streaming ages: {e}")
+    finally:
+        if exhausted:
+            if cursor:
+                cursor.close()
+            if conn.is_connected():
+                conn.close()
+        else:
+            # Closing normally would drain the remaining result set first;
+            # drop the socket instead when the consumer stopped early.
+            conn.shutdown()
+
+
+def percentiles_from_histogram(histogram, count, percentiles):
+    """Nearest-rank percentiles from a {value: frequency} mapping"""
+    result = {}
+    if not count:
+        return result
+    ranks = {p: max(1, math.ceil(p / 100 * count)) for p in percentiles}
+    seen = 0
+    for value in sorted(histogram):
+        seen += histogram[value]
+        for p, rank in ranks.items():
+            if p not in result and seen >= rank:
+                result[p] = value
+    return result
+
+
+class AgeStats:
+    """Single-pass accumulator for count, mean, variance, min, max.
+
+    Mean and variance use Welford's update. Ages are small integers, so an
+    exact frequency histogram gives the quantiles in O(distinct ages) memory.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = None
+        self.max = None
+        self.histogram = Counter()
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        self.histogram[value] += 1
+
+    @property
+    def variance(self):
+        return self._m2 / self.count if self.count else 0.0
+
+    def summary(self, percentiles=DEFAULT_PERCENTILES):
+        return {
+            "count": self.count,
+            "avg": self.mean if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "variance": self.variance if self.count else None,
+            "percentiles": percentiles_from_histogram(
+                self.histogram, self.count, percentiles),
+        }
+
+
+def sql_age_stats(percentiles=DEFAULT_PERCENTILES):
+    """Compute the age summary with aggregate queries on the server"""
+    conn = connect_to_prodev()
+    cursor = None
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT COUNT(age), AVG(age), MIN(age), MAX(age), VAR_POP(age) "
+            "FROM user_data"
+        )
+        count, avg, min_age, max_age, variance = cursor.fetchone()
+        # MySQL has no PERCENTILE_CONT; the age histogram is tiny, so the
+        # exact percentiles come from a grouped count instead.
+        cursor.execute("SELECT age, COUNT(*) FROM user_data GROUP BY age")
+        histogram = {int(age): freq for age, freq in cursor.fetchall()}
+        return {
+            "count": count,
+            "avg": float(avg) if count else None,
+            "min": int(min_age) if count else None,
+            "max": int(max_age) if count else None,
+            "variance": float(variance) if count else None,
+            "percentiles": percentiles_from_histogram(
+                histogram, count, percentiles),
+        }
     finally:
         if cursor:
             cursor.close()
-        if conn and conn.is_connected():
+        if conn.is_connected():
             conn.close()
 
-def compute_average_age():
-    total = 0
-    count = 0
 
+def streaming_age_stats(percentiles=DEFAULT_PERCENTILES):
+    stats = AgeStats()
     for age in stream_user_ages():
-        total += age
-        count += 1
+        stats.add(age)
+    return stats.summary(percentiles)
+
 
-    if count == 0:
+def age_stats(percentiles=DEFAULT_PERCENTILES):
+    """Age summary computed in SQL, or in one streaming pass as fallback"""
+    try:
+        return sql_age_stats(percentiles)
+    except Exception as e:
+        print(f"SQL aggregation unavailable, streaming instead: {e}")
+        return streaming_age_stats(percentiles)
+
+
+def compute_average_age():
+    stats = age_stats()
+
+    if stats["count"] == 0:
         print("No users found.")
     else:
-        average = total / count
-        print(f"Average age of users: {average:.2f}")
+        print(f"Average age of users: {stats['avg']:.2f}")
+
 
 if __name__ == "__main__":
     compute_average_age()
@@ -0,0 +1,133 @@
+import asyncio
+import contextlib
+
+import aiomysql
+
+from connection_pool import PRODEV_CONFIG
+from seed import USER_COLUMNS
+
+DEFAULT_FETCH_SIZE = 1000
+DEFAULT_PREFETCH = 4
+
+_DONE = object()
+
+_SELECT_USERS = f"SELECT {', '.join(USER_COLUMNS)} FROM user_data"
+
+
+async def aconnect_to_prodev():
+    return await aiomysql.connect(
+        host=PRODEV_CONFIG["host"],
+        user=PRODEV_CONFIG["user"],
+        password=PRODEV_CONFIG["password"],
+        db=PRODEV_CONFIG["database"],
+        connect_timeout=PRODEV_CONFIG["connection_timeout"],
+    )
+
+
+async def _stream_batches(query, params, fetch_size):
+    """Read a query through a server-side cursor, fetch_size rows at a time"""
+    conn = await aconnect_to_prodev()
+    cursor = None
+    exhausted = False
+    try:
+        cursor = await conn.cursor(aiomysql.SSDictCursor)
+        await cursor.execute(query, params)
+        while True:
+            rows = await cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+            yield rows
+        exhausted = True
+    finally:
+        # Closing an unbuffered cursor drains the rest of the result set, so
+        # only do it when the stream finished; otherwise just drop the socket.
+        if exhausted and cursor:
+            await cursor.close()
+        conn.close()
+
+
+async def _keyset_pages(page_size):
+    conn = await aconnect_to_prodev()
+    try:
+        async with conn.cursor(aiomysql.DictCursor) as cursor:
+            last_key = None
+            while True:
+                if last_key is None:
+                    await cursor.execute(
+                        f"{_SELECT_USERS} ORDER BY user_id LIMIT %s",
+                        (page_size,))
+                else:
+                    await cursor.execute(
+                        f"{_SELECT_USERS} WHERE user_id > %s "
+                        "ORDER BY user_id LIMIT %s", (last_key, page_size))
+                page = await cursor.fetchall()
+                if not page:
+                    break
+                yield list(page)
+                if len(page) < page_size:
+                    break
+                last_key = page[-1]["user_id"]
+    finally:
+        conn.close()
+
+
+async def _prefetched(batches, prefetch):
+    """Run `batches` in a background task, buffering at most `prefetch` items.
+
+    The bounded queue applies backpressure: the producer stops reading from
+    the database while the consumer is `prefetch` items behind. As with
+    lazy_paginate, prefetch=0 means no read-ahead at all.
+    """
+    if prefetch < 1:
+        # asyncio.Queue(maxsize=0) would be unbounded and buffer everything
+        try:
+            async for batch in batches:
+                yield batch
+        finally:
+            await batches.aclose()
+        return
+
+    queue = asyncio.Queue(maxsize=prefetch)
+
+    async def producer():
+        try:
+            async for batch in batches:
+                await queue.put(batch)
+            await queue.put(_DONE)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await batches.aclose()
+
+    task = asyncio.create_task(producer())
+    try:
+        while True:
+            item = await queue.get()
+            if item is _DONE:
+                break
+            if isinstance(item, Exception):
+                raise item
+            yield item
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+
+
+async def astream_users_in_batches(batch_size, prefetch=DEFAULT_PREFETCH):
+    batches = _stream_batches(_SELECT_USERS, (), batch_size)
+    async for batch in _prefetched(batches, prefetch):
+        yield batch
+
+
+async def astream_users(fetch_size=DEFAULT_FETCH_SIZE,
+                        prefetch=DEFAULT_PREFETCH):
+    async for batch in astream_users_in_batches(fetch_size, prefetch):
+        for row in batch:
+            yield row
+
+
+async def alazy_paginate(page_size, prefetch=DEFAULT_PREFETCH):
+    """Keyset-paginated pages of user_data, fetched ahead of the consumer"""
+    async for page in _prefetched(_keyset_pages(page_size), prefetch):
+        yield page
@@ -0,0 +1,262 @@
+"""Throughput benchmarks for the python-generators-0x00 streaming paths.
+
+Seeds a scratch MySQL database with synthetic users, then runs each
+generator across a range of batch/page sizes. Every case runs in a fresh
+process so its peak RSS is its own, and the results are emitted as JSON:
+
+    python3 benchmarks.py --rows 100000 --sizes 100 1000 --output bench.json
+
+--ingest also times the seed.py loaders on a generated CSV of --rows users,
+reporting each one's speedup over the row-by-row insert_data.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+from connection_pool import SERVER_CONFIG, connect_with_retry, get_pool
+
+BENCH_DATABASE = "ALX_prodev_bench"
+
+
+def use_bench_database(database):
+    """Point the shared prodev pool at the scratch database.
+
+    Must run before any generator checks out a connection in this process.
+    """
+    get_pool(config=dict(SERVER_CONFIG, database=database))
+
+
+def seed_bench_database(database, rows, chunk_size=5000):
+    from seed import USER_TABLE_DDL, INSERT_USER_SQL
+
+    conn = connect_with_retry(SERVER_CONFIG)
+    cursor = conn.cursor()
+    try:
+        cursor.execute(f"DROP DATABASE IF EXISTS {database}")
+        cursor.execute(f"CREATE DATABASE {database}")
+        cursor.execute(f"USE {database}")
+        cursor.execute(USER_TABLE_DDL)
+        for start in range(0, rows, chunk_size):
+            chunk = [
+                (str(uuid.uuid4()), f"User {i}", f"user{i}@example.com",
+                 random.randint(1, 100))
+                for i in range(start, min(rows, start + chunk_size))
+            ]
+            cursor.executemany(INSERT_USER_SQL, chunk)
+            conn.commit()
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def _load(module_name):
+    return __import__(module_name)
+
+
+# Connections opened outside the pool by the per-page baseline
+_raw_connections = 0
+
+
+def paginate_per_page_connection(page_size):
+    """The pre-pooling crawl: every page opens and closes its own connection"""
+    global _raw_connections
+    paginate_users = _load('2-lazy_paginate').paginate_users
+    config = get_pool().config
+    offset = 0
+    while True:
+        conn = connect_with_retry(config)
+        _raw_connections += 1
+        try:
+            page = paginate_users(page_size, offset, conn=conn)
+        finally:
+            conn.close()
+        if not page:
+            break
+        yield page
+        offset += page_size
+
+
+def _count_rows(items, nested):
+    if nested:
+        return sum(len(item) for item in items)
+    return sum(1 for _ in items)
+
+
+CASES = {
+    "stream_users": lambda size: (
+        _load('0-stream_users').stream_users(fetch_size=size), False),
+    "stream_user_rows": lambda size: (
+        _load('0-stream_users').stream_user_rows(fetch_size=size), False),
+    "stream_users_in_batches": lambda size: (
+        _load('1-batch_processing').stream_users_in_batches(size), True),
+    "lazy_paginate_per_page": lambda size: (
+        paginate_per_page_connection(size), True),
+    "lazy_paginate_offset": lambda size: (
+        _load('2-lazy_paginate').lazy_paginate(size), True),
+    "lazy_paginate_keyset": lambda size: (
+        _load('2-lazy_paginate').lazy_paginate(size, keyset=True), True),
+    "lazy_paginate_prefetch": lambda size: (
+        _load('2-lazy_paginate').lazy_paginate(size, keyset=True,
+                                               prefetch=4), True),
+    "stream_user_ages": lambda size: (
+        _load('4-stream_ages').stream_user_ages(), False),
+}
+
+# Cases whose generator takes no size argument only run once
+UNSIZED_CASES = {"stream_user_ages"}
+
+
+def run_case(database, name, size):
+    """Run one case to completion; meant to execute in a fresh process"""
+    # The generators print connection notices; keep stdout for the JSON
+    sys.stdout = sys.stderr
+    use_bench_database(database)
+    items, nested = CASES[name](size)
+    start = time.perf_counter()
+    rows = _count_rows(items, nested)
+    elapsed = time.perf_counter() - start
+    stats = get_pool().stats()
+    return {
+        "case": name,
+        "size": size,
+        "rows": rows,
+        "seconds": round(elapsed, 6),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        # ru_maxrss is KiB on Linux and bytes on macOS
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        // (1024 if sys.platform == "darwin" else 1),
+        "connections_opened": stats["created"] + _raw_connections,
+        "checkouts": stats["checkouts"],
+    }
+
+
+INGEST_CASES = {
+    "insert_data": lambda conn, path: _load('seed').insert_data(conn, path),
+    "bulk_insert_data": lambda conn, path: (
+        _load('seed').bulk_insert_data(conn, path)),
+    "load_data_infile": lambda conn, path: (
+        _load('seed').bulk_insert_data(conn, path, use_load_data=True)),
+}
+
+
+def write_bench_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(("user_id", "name", "email", "age"))
+        for i in range(rows):
+            writer.writerow((str(uuid.uuid4()), f"User {i}",
+                             f"ingest{i}@example.com", random.randint(1, 100)))
+
+
+def run_ingest_case(database, name, path, rows):
+    """Load the CSV into an emptied user_data; meant for a fresh process"""
+    sys.stdout = sys.stderr
+    conn = connect_with_retry(dict(SERVER_CONFIG, database=database,
+                                   allow_local_infile=True))
+    try:
+        cursor = conn.cursor()
+        cursor.execute("TRUNCATE TABLE user_data")
+        cursor.close()
+        start = time.perf_counter()
+        INGEST_CASES[name](conn, path)
+        elapsed = time.perf_counter() - start
+    finally:
+        conn.close()
+    return {
+        "case": name,
+        "rows": rows,
+        "seconds": round(elapsed, 6),
+        "rows_per_sec": round(rows / elapsed, 1) if elapsed else None,
+        "peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        // (1024 if sys.platform == "darwin" else 1),
+    }
+
+
+def run_ingest_suite(database, cases, rows):
+    """Time each loader on the same CSV; truncates the scratch table"""
+    results = []
+    spawn = get_context("spawn")
+    fd, path = tempfile.mkstemp(suffix=".csv")
+    os.close(fd)
+    try:
+        write_bench_csv(path, rows)
+        for name in cases:
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                result = pool.submit(run_ingest_case, database, name, path,
+                                     rows).result()
+            print(f"{name:<26} {result['rows_per_sec']} rows/sec",
+                  file=sys.stderr)
+            results.append(result)
+    finally:
+        os.remove(path)
+
+    baseline = next((r["seconds"] for r in results
+                     if r["case"] == "insert_data"), None)
+    for result in results:
+        result["speedup_vs_insert_data"] = (
+            round(baseline / result["seconds"], 2)
+            if baseline and result["seconds"] else None)
+    return results
+
+
+def run_suite(database, cases, sizes):
+    results = []
+    spawn = get_context("spawn")
+    for name in cases:
+        for size in sizes[:1] if name in UNSIZED_CASES else sizes:
+            with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as pool:
+                result = pool.submit(run_case, database, name, size).result()
+            print(f"{name:<26} size={size:<6} "
+                  f"{result['rows_per_sec']} rows/sec", file=sys.stderr)
+            results.append(result)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10, 100, 1000])
+    parser.add_argument("--cases", nargs="+", choices=sorted(CASES),
+                        default=list(CASES))
+    parser.add_argument("--ingest", nargs="*", choices=sorted(INGEST_CASES),
+                        help="also time these CSV loaders (all if none given)")
+    parser.add_argument("--database", default=BENCH_DATABASE)
+    parser.add_argument("--skip-seed", action="store_true",
+                        help="reuse the rows already in --database")
+    parser.add_argument("--output", help="write JSON here instead of stdout")
+    args = parser.parse_args(argv)
+
+    if not args.skip_seed:
+        seed_bench_database(args.database, args.rows)
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "seeded_rows": None if args.skip_seed else args.rows,
+        "results": run_suite(args.database, args.cases, args.sizes),
+    }
+    if args.ingest is not None:
+        # Runs last because every loader starts from an empty user_data
+        report["ingest"] = run_ingest_suite(
+            args.database, args.ingest or list(INGEST_CASES), args.rows)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import os
+
+from seed import connect_to_prodev
+
+DEFAULT_CHECKPOINT = ".user_data_checkpoint.json"
+
+
+def load_checkpoint(path=DEFAULT_CHECKPOINT):
+    """Return the saved (updated_at, user_id) high-water mark, or None"""
+    try:
+        with open(path) as f:
+            data = json.load(f)
+        return data["updated_at"], data["user_id"]
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(updated_at, user_id, path=DEFAULT_CHECKPOINT):
+    """Persist the high-water mark atomically so a crash never truncates it.
+
+    updated_at is stored as UTC text, which never repeats across a DST
+    change the way local wall-clock time does.
+    """
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"updated_at": str(updated_at), "user_id": user_id}, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def stream_user_changes(checkpoint_path=DEFAULT_CHECKPOINT, page_size=1000,
+                        settle_seconds=1):
+    """Yield user_data rows inserted or updated since the last run.
+
+    Rows are read in (updated_at, user_id) order by seeking on the change
+    index, and the checkpoint advances once a whole page has been handed to
+    the consumer, so an interrupted sync replays at most one page. Rows
+    changed within the last settle_seconds are left for the next run, which
+    gives in-flight transactions time to commit with their timestamps.
+    """
+    mark = load_checkpoint(checkpoint_path)
+    conn = connect_to_prodev()
+    cursor = None
+    session_zone = None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        # Read and compare updated_at in UTC; the pooled connection gets its
+        # own zone back afterwards
+        cursor.execute("SELECT @@session.time_zone AS zone")
+        session_zone = cursor.fetchone()["zone"]
+        cursor.execute("SET time_zone = '+00:00'")
+        while True:
+            settled = "updated_at <= NOW(6) - INTERVAL %s SECOND"
+            if mark is None:
+                cursor.execute(
+                    f"SELECT * FROM user_data WHERE {settled} "
+                    "ORDER BY updated_at, user_id LIMIT %s",
+                    (settle_seconds, page_size))
+            else:
+                cursor.execute(
+                    f"SELECT * FROM user_data WHERE {settled} "
+                    "AND (updated_at > %s OR (updated_at = %s AND user_id > %s)) "
+                    "ORDER BY updated_at, user_id LIMIT %s",
+                    (settle_seconds, mark[0], mark[0], mark[1], page_size))
+            page = cursor.fetchall()
+            if not page:
+                break
+
+            yield from page
+
+            last = page[-1]
+            mark = (str(last["updated_at"]), last["user_id"])
+            save_checkpoint(*mark, path=checkpoint_path)
+            if len(page) < page_size:
+                break
+    finally:
+        restored = session_zone is None
+        if cursor:
+            if not restored:
+                try:
+                    cursor.execute("SET time_zone = %s", (session_zone,))
+                    restored = True
+                except Exception as e:
+                    print(f"Error restoring time zone: {e}")
+            cursor.close()
+        if not restored:
+            # Never hand a UTC session back to other users of the pool
+            conn.shutdown()
+        elif conn.is_connected():
+            conn.close()
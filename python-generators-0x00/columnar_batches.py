@@ -0,0 +1,73 @@
+import numpy as np
+
+from seed import connect_to_prodev, USER_COLUMNS
+
+# DECIMAL(3,0) ages always fit in 16 bits
+AGE_DTYPE = np.int16
+
+
+def to_columns(rows):
+    """Turn a list of (user_id, name, email, age) tuples into column arrays.
+
+    Text columns become fixed-width UTF-8 byte arrays ('S' dtype), which
+    cost one byte per character instead of a Python object per value.
+    """
+    user_ids, names, emails, ages = zip(*rows)
+    return {
+        "user_id": np.array([value.encode() for value in user_ids]),
+        "name": np.array([value.encode() for value in names]),
+        "email": np.array([value.encode() for value in emails]),
+        "age": np.fromiter((int(age) for age in ages), dtype=AGE_DTYPE,
+                           count=len(ages)),
+    }
+
+
+def select_rows(columns, mask):
+    """Apply a boolean mask (or index array) to every column of a batch"""
+    return {name: values[mask] for name, values in columns.items()}
+
+
+def stream_users_in_columnar_batches(batch_size, min_age=None):
+    """Like stream_users_in_batches, but each batch is a dict of arrays"""
+    conn = connect_to_prodev()
+    cursor = None
+    exhausted = False
+    try:
+        cursor = conn.cursor()
+        query = f"SELECT {', '.join(USER_COLUMNS)} FROM user_data"
+        if min_age is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query + " WHERE age > %s", (min_age,))
+
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield to_columns(rows)
+        exhausted = True
+
+    except Exception as e:
+        print(f"Error streaming columnar batches: {e}")
+    finally:
+        if exhausted:
+            if cursor:
+                cursor.close()
+            if conn.is_connected():
+                conn.close()
+        else:
+            # Avoid draining the unread result set when stopped early
+            conn.shutdown()
+
+
+def columnar_batch_processing(batch_size, min_age=25, predicate=None):
+    """Yield columnar batches of users older than min_age.
+
+    The age check runs in SQL; predicate, if given, takes the column dict
+    and returns a boolean mask, e.g. ``lambda c: c["age"] < 60``.
+    """
+    for columns in stream_users_in_columnar_batches(batch_size, min_age):
+        if predicate is not None:
+            columns = select_rows(columns, predicate(columns))
+        if len(columns["age"]):
+            yield columns
@@ -0,0 +1,280 @@
+import os
+import random
+import threading
+import time
+import weakref
+
+import mysql.connector
+from mysql.connector import Error, InterfaceError
+
+SERVER_CONFIG = {
+    "host": "localhost",
+    "user": "root",
+    "password": "root",
+    "connection_timeout": 5,
+}
+
+PRODEV_CONFIG = dict(SERVER_CONFIG, database="ALX_prodev")
+
+# Seconds acquire() waits for a free connection before raising PoolTimeout
+CHECKOUT_TIMEOUT = 30
+
+
+class PoolTimeout(Exception):
+    """Raised when no connection frees up within the checkout timeout"""
+
+
+def backoff_delay(attempt, base_delay=0.5, max_delay=8.0):
+    """Full-jitter exponential backoff: uniform in [0, base * 2**attempt]"""
+    return random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+
+
+def connect_with_retry(config, max_retries=3, base_delay=0.5, max_delay=8.0):
+    """Open a raw connection, retrying with jittered exponential backoff"""
+    attempt = 0
+    while True:
+        try:
+            return mysql.connector.connect(**config)
+        except (Error, InterfaceError) as e:
+            attempt += 1
+            reason = str(e).splitlines()[0] if str(e) else repr(e)
+            print(f"Connection attempt {attempt} failed: {reason}")
+            if attempt >= max_retries:
+                raise
+            time.sleep(backoff_delay(attempt - 1, base_delay, max_delay))
+
+
+def _reclaim(pool, conn):
+    print("Discarding a pooled connection that was never closed")
+    pool.discard(conn)
+
+
+class PooledConnection:
+    """Proxy whose close() hands the connection back to its pool.
+
+    A proxy garbage-collected without close() discards its connection, so
+    a leaked checkout frees its slot instead of holding it forever.
+    """
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._released = False
+        self._finalizer = weakref.finalize(self, _reclaim, pool, conn)
+        self._finalizer.atexit = False
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def is_connected(self):
+        return not self._released and self._conn.is_connected()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._finalizer.detach()
+            self._pool.release(self._conn)
+
+    def shutdown(self):
+        """Drop the socket without draining results; never reused"""
+        if not self._released:
+            self._released = True
+            self._finalizer.detach()
+            self._pool.discard(self._conn)
+
+
+class ConnectionPool:
+    """Thread-safe pool of MySQL connections.
+
+    Opens min_size connections up front and keeps up to max_size, pings
+    connections that sat idle longer than health_check_after before handing
+    them out, and closes spare connections idle for more than idle_timeout
+    seconds.
+    """
+
+    def __init__(self, config, min_size=1, max_size=10, idle_timeout=300,
+                 health_check_after=30, max_retries=3, base_delay=0.5,
+                 max_delay=8.0):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Require 0 <= min_size <= max_size, max_size >= 1")
+        self.config = config
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_after = health_check_after
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        self._idle = []  # (conn, released_at), most recently used last
+        self._size = 0
+        self._cond = threading.Condition()
+        self.metrics = {
+            "checkouts": 0,
+            "waits": 0,
+            "wait_time": 0.0,
+            "created": 0,
+            "evicted": 0,
+            "discarded": 0,
+        }
+        try:
+            for _ in range(min_size):
+                self._idle.append((self._open(), time.monotonic()))
+                self._size += 1
+                self.metrics["created"] += 1
+        except Exception:
+            self.close_all()
+            raise
+
+    def _open(self, max_retries=None):
+        if max_retries is None:
+            max_retries = self.max_retries
+        conn = connect_with_retry(self.config, max_retries,
+                                  self.base_delay, self.max_delay)
+        print("Successfully connected")
+        return conn
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _healthy(self, conn, idle_for):
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _evict_idle(self, now):
+        """Close spare connections idle past idle_timeout; call under lock"""
+        expired = []
+        while (self._size > self.min_size and self._idle
+               and now - self._idle[0][1] > self.idle_timeout):
+            expired.append(self._idle.pop(0)[0])
+            self._size -= 1
+            self.metrics["evicted"] += 1
+        return expired
+
+    def acquire(self, timeout=CHECKOUT_TIMEOUT, max_retries=None):
+        """Check out a connection, waiting up to timeout seconds if full.
+
+        timeout=None waits indefinitely. max_retries overrides the pool's
+        connect retries when this checkout has to open a connection.
+        """
+        started = time.monotonic()
+        waited = False
+        while True:
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    waited = True
+                    remaining = None
+                    if timeout is not None:
+                        remaining = timeout - (time.monotonic() - started)
+                        if remaining <= 0:
+                            raise PoolTimeout(
+                                f"No connection available after {timeout}s")
+                    self._cond.wait(remaining)
+
+                if waited:
+                    self.metrics["waits"] += 1
+                    self.metrics["wait_time"] += time.monotonic() - started
+                    waited = False
+
+                if self._idle:
+                    conn, released_at = self._idle.pop()
+                else:
+                    conn, released_at = None, None
+                    self._size += 1
+
+            if conn is None:
+                try:
+                    conn = self._open(max_retries)
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self.metrics["created"] += 1
+            elif not self._healthy(conn, time.monotonic() - released_at):
+                self.discard(conn)
+                continue
+
+            with self._cond:
+                self.metrics["checkouts"] += 1
+            return PooledConnection(self, conn)
+
+    def release(self, conn):
+        """Return a raw connection to the pool, discarding it if unusable"""
+        try:
+            if conn.unread_result:
+                self.discard(conn)
+                return
+            if conn.in_transaction:
+                conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+
+        with self._cond:
+            now = time.monotonic()
+            self._idle.append((conn, now))
+            expired = self._evict_idle(now)
+            self._cond.notify()
+        for stale in expired:
+            self._close_quietly(stale)
+
+    def discard(self, conn):
+        """Drop a broken connection and free its slot"""
+        try:
+            conn.shutdown()
+        except Exception:
+            pass
+        with self._cond:
+            self._size -= 1
+            self.metrics["discarded"] += 1
+            self._cond.notify()
+
+    def close_all(self):
+        with self._cond:
+            idle = [conn for conn, _ in self._idle]
+            self._size -= len(idle)
+            self._idle = []
+        for conn in idle:
+            self._close_quietly(conn)
+
+    def stats(self):
+        with self._cond:
+            return dict(self.metrics, size=self._size, idle=len(self._idle))
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(name="prodev", config=None, **options):
+    """Process-wide shared pool; rebuilt after fork so sockets aren't shared.
+
+    The first call for a name creates the pool (with PRODEV_CONFIG unless a
+    config is given); later calls may repeat its settings but not change
+    them.
+    """
+    key = (name, os.getpid())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool(config or PRODEV_CONFIG,
+                                                **options)
+            return pool
+        changed = sorted(option for option, value in options.items()
+                         if getattr(pool, option, None) != value)
+        if config is not None and config != pool.config:
+            changed.insert(0, "config")
+        if changed:
+            raise ValueError(
+                f"Pool {name!r} already exists with different {changed}")
+        return pool
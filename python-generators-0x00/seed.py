@@ -1,28 +1,40 @@
 import mysql.connector
 import csv
+import mmap
+import os
+import re
 import sys
-import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from mysql.connector import Error, InterfaceError
 
-def connect_db(max_retries=3, retry_delay=2):
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            conn = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="root",
-                connection_timeout=5
-            )
-            print("Successfully connected to MySQL server")
-            return conn
-        except (Error, InterfaceError) as e:
-            attempt += 1
-            print(f"Connection attempt {attempt} failed: {str(e).split('\n')[0]}")
-            if attempt == max_retries:
-                print("Max connection attempts reached. Exiting.")
-                sys.exit(1)
-            time.sleep(retry_delay)
+from connection_pool import (
+    PRODEV_CONFIG, SERVER_CONFIG, PoolTimeout, connect_with_retry, get_pool,
+)
+
+# Column order of the user_data table, shared by the streaming modules
+USER_COLUMNS = ("user_id", "name", "email", "age")
+
+USER_TABLE_DDL = """
+    CREATE TABLE user_data (
+        user_id VARCHAR(36) PRIMARY KEY,
+        name VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        age DECIMAL(3,0) NOT NULL CHECK (age > 0),
+        updated_at TIMESTAMP(6) NOT NULL
+            DEFAULT CURRENT_TIMESTAMP(6) ON UPDATE CURRENT_TIMESTAMP(6),
+        INDEX idx_user_data_changes (updated_at, user_id)
+    )
+"""
+
+def connect_db(max_retries=3):
+    try:
+        conn = connect_with_retry(SERVER_CONFIG, max_retries)
+    except (Error, InterfaceError):
+        print("Max connection attempts reached. Exiting.")
+        sys.exit(1)
+    print("Successfully connected to MySQL server")
+    return conn
 
 def check_database_exists(connection, dbname):
 
@@ -50,26 +62,24 @@ def create_database(connection):
         print(f"Error creating database: {e}")
         sys.exit(1)
 
-def connect_to_prodev(max_retries=3):
-    attempt = 0
-    while attempt < max_retries:
-        try:
-            conn = mysql.connector.connect(
-                host="localhost",
-                user="root",
-                password="root",
-                database="ALX_prodev",
-                connection_timeout=5
-            )
-            print("Successfully connected")
-            return conn
-        except (Error, InterfaceError) as e:
-            attempt += 1
-            print(f"Connection attempt {attempt} failed: {str(e).split('\n')[0]}")
-            if attempt == max_retries:
-                print("Max connection attempts reached. Exiting.")
-                sys.exit(1)
-            time.sleep(retry_delay)
+def connect_to_prodev(max_retries=3, local_infile=False):
+    """Check out a connection from the shared ALX_prodev pool.
+
+    Calling close() on it returns it to the pool instead of disconnecting.
+    local_infile=True instead opens a dedicated connection that allows
+    LOAD DATA LOCAL INFILE, as bulk_insert_data(use_load_data=True) needs.
+    """
+    try:
+        if local_infile:
+            config = dict(PRODEV_CONFIG, allow_local_infile=True)
+            return connect_with_retry(config, max_retries)
+        return get_pool().acquire(max_retries=max_retries)
+    except (Error, InterfaceError):
+        print("Max connection attempts reached. Exiting.")
+        sys.exit(1)
+    except PoolTimeout as e:
+        print(f"{e}. Exiting.")
+        sys.exit(1)
 
 def check_table_exists(connection, table_name):
     """Check if table exists in database"""
@@ -94,14 +104,7 @@ def create_table(connection):
         cursor = connection.cursor()
         
         if not check_table_exists(connection, "user_data"):
-            cursor.execute("""
-                CREATE TABLE user_data (
-                    user_id VARCHAR(36) PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) NOT NULL UNIQUE,
-                    age DECIMAL(3,0) NOT NULL CHECK (age > 0)
-                )
-            """)
+            cursor.execute(USER_TABLE_DDL)
             print("✓ Table user_data created successfully")
         else:
             print("ℹ Table user_data already exists")
@@ -111,6 +114,34 @@ def create_table(connection):
         print(f"Error creating table: {e}")
         connection.rollback()
 
+def add_change_tracking(connection):
+    """Add the updated_at column and index to a pre-existing user_data table.
+
+    Rows that already exist get the migration time as their updated_at.
+    """
+    try:
+        cursor = connection.cursor()
+        cursor.execute("""
+            SELECT COUNT(*)
+            FROM information_schema.columns
+            WHERE table_schema = DATABASE()
+            AND table_name = 'user_data'
+            AND column_name = 'updated_at'
+        """)
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("""
+                ALTER TABLE user_data
+                ADD COLUMN updated_at TIMESTAMP(6) NOT NULL
+                    DEFAULT CURRENT_TIMESTAMP(6)
+                    ON UPDATE CURRENT_TIMESTAMP(6),
+                ADD INDEX idx_user_data_changes (updated_at, user_id)
+            """)
+            print("✓ Change tracking added to user_data")
+        cursor.close()
+    except Error as e:
+        print(f"Error adding change tracking: {e}")
+        connection.rollback()
+
 def insert_data(connection, filename):
     try:
         cursor = connection.cursor()
@@ -136,7 +167,7 @@ def insert_data(connection, filename):
                         
                 except Error as e:
                     errors += 1
-                    print(f"⚠ Error inserting record {row.get('user_id', 'UNKNOWN')}: {str(e).split('\n')[0]}")
+                    print(f"⚠ Error inserting record {row.get('user_id', 'UNKNOWN')}: {str(e).splitlines()[0]}")
                     connection.rollback()
                     continue
             
@@ -153,6 +184,316 @@ def insert_data(connection, filename):
         if cursor:
             cursor.close()
 
+# MySQL error code IGNORE reports for a duplicate key
+DUPLICATE_ENTRY_CODE = 1062
+
+INSERT_USER_SQL = """
+    INSERT INTO user_data (user_id, name, email, age)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE user_id=user_id
+"""
+
+
+# One CSV field plus the separator that ends it; quoted fields may hold
+# commas, doubled quotes and newlines.
+CSV_FIELD = re.compile(rb'(?:"((?:[^"]|"")*)"|([^,"\r\n]*))(,|\r?\n|\Z)')
+
+
+def mmap_csv_rows(filename, start=0, end=None):
+    """Yield CSV records as tuples of str straight from an mmap of the file.
+
+    The regex scans the mapped pages in place, so no line strings or per-row
+    dicts are built; only the field values themselves are decoded. start
+    must be a record start. Blank lines come out as empty tuples, like
+    csv.reader, and malformed fields (such as a stray quote inside an
+    unquoted field) raise ValueError.
+    """
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            end = len(mm) if end is None else end
+            fields = []
+            pos = start
+            for match in CSV_FIELD.finditer(mm, start, end):
+                # finditer skips text the pattern cannot match; such a gap
+                # is a malformed field, not something to drop silently
+                if match.start() != pos:
+                    raise ValueError(
+                        f"Malformed CSV field at byte {pos} of {filename}")
+                if match.start() == end:
+                    if fields:
+                        # A trailing comma at end of input ends an empty field
+                        fields.append('')
+                        yield tuple(fields)
+                    break
+                pos = match.end()
+                quoted, bare, sep = match.groups()
+                if quoted is not None:
+                    fields.append(quoted.replace(b'""', b'"').decode('utf-8'))
+                else:
+                    fields.append(bare.decode('utf-8'))
+                if sep != b',':
+                    if fields == [''] and quoted is None:
+                        fields.clear()
+                    yield tuple(fields)
+                    fields.clear()
+
+
+def csv_positions(header):
+    """Index of each USER_COLUMNS entry in a CSV header (None if absent)"""
+    return [header.index(col) if col in header else None
+            for col in USER_COLUMNS]
+
+
+def chunk_records(rows, positions, chunk_size):
+    """Group parsed CSV rows into user_data tuples, generating user_id"""
+    chunk = []
+    for row in rows:
+        if not row:
+            continue
+        chunk.append(tuple(
+            str(uuid.uuid4()) if pos is None else row[pos]
+            for pos in positions
+        ))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_csv_chunks(filename, chunk_size):
+    """Yield lists of user_data tuples, generating user_id when absent"""
+    rows = mmap_csv_rows(filename)
+    positions = csv_positions(list(next(rows, ())))
+    yield from chunk_records(rows, positions, chunk_size)
+
+
+def insert_chunk(connection, cursor, chunk):
+    """Insert one chunk in a single transaction.
+
+    Returns (inserted, duplicates, errors). A failing chunk is rolled back
+    and replayed row by row so one bad record only costs itself.
+    """
+    try:
+        cursor.executemany(INSERT_USER_SQL, chunk)
+        connection.commit()
+        # Rows that hit ON DUPLICATE KEY without changing count as 0
+        return cursor.rowcount, len(chunk) - cursor.rowcount, 0
+    except Error:
+        connection.rollback()
+
+    inserted = duplicates = errors = 0
+    for record in chunk:
+        try:
+            cursor.execute(INSERT_USER_SQL, record)
+            if cursor.rowcount == 1:
+                inserted += 1
+            else:
+                duplicates += 1
+        except Error as e:
+            errors += 1
+            reason = str(e).splitlines()[0]
+            print(f"⚠ Error inserting record {record[0]}: {reason}")
+    connection.commit()
+    return inserted, duplicates, errors
+
+
+def load_data_infile(connection, filename):
+    """Load the whole CSV server-side with LOAD DATA LOCAL INFILE.
+
+    Needs a connection opened with allow_local_infile=True, such as
+    connect_to_prodev(local_infile=True). Returns
+    (inserted, duplicates, errors); IGNORE turns both duplicate keys and
+    rejected rows into warnings, which are told apart by error code.
+    """
+    with open(filename, newline='') as csvfile:
+        header = next(csv.reader(csvfile), [])
+    unknown = [col for col in header if col not in USER_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unexpected CSV columns: {unknown}")
+    # Count records, not lines: quoted fields may span lines
+    record_count = sum(1 for row in mmap_csv_rows(filename) if row) - 1
+
+    set_clause = "" if "user_id" in header else " SET user_id = UUID()"
+    cursor = connection.cursor()
+    try:
+        # Keep as many warnings as the server allows so they can be counted
+        cursor.execute("SET SESSION max_error_count = 65535")
+        cursor.execute(f"""
+            LOAD DATA LOCAL INFILE %s IGNORE INTO TABLE user_data
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"'
+            IGNORE 1 LINES ({', '.join(header)}){set_clause}
+        """, (filename,))
+        inserted = cursor.rowcount
+        cursor.execute("SHOW COUNT(*) WARNINGS")
+        warning_count = cursor.fetchone()[0]
+        cursor.execute("SHOW WARNINGS")
+        warnings = cursor.fetchall()
+        connection.commit()
+    finally:
+        cursor.close()
+
+    duplicates = sum(1 for _, code, _ in warnings
+                     if code == DUPLICATE_ENTRY_CODE)
+    others = [message for _, code, message in warnings
+              if code != DUPLICATE_ENTRY_CODE]
+    for message in others[:10]:
+        print(f"⚠ LOAD DATA warning: {message}")
+    if warning_count > len(warnings):
+        print(f"⚠ Only {len(warnings)} of {warning_count} warnings were "
+              f"inspected; duplicates may be undercounted")
+    skipped = max(record_count - inserted, 0)
+    duplicates = min(duplicates, skipped)
+    return inserted, duplicates, skipped - duplicates
+
+
+def bulk_insert_data(connection, filename, chunk_size=5000,
+                     use_load_data=False):
+    """Bulk variant of insert_data: multi-row inserts committed per chunk.
+
+    use_load_data=True loads server-side instead and needs a connection
+    from connect_to_prodev(local_infile=True).
+    """
+    records_inserted = duplicates_skipped = errors = 0
+    cursor = None
+    try:
+        if use_load_data:
+            records_inserted, duplicates_skipped, errors = load_data_infile(
+                connection, filename)
+        else:
+            cursor = connection.cursor()
+            for chunk in read_csv_chunks(filename, chunk_size):
+                inserted, duplicates, failed = insert_chunk(
+                    connection, cursor, chunk)
+                records_inserted += inserted
+                duplicates_skipped += duplicates
+                errors += failed
+
+        print(f"\nData import summary:")
+        print(f"Records inserted: {records_inserted}")
+        print(f"Duplicates skipped: {duplicates_skipped}")
+        print(f"Errors encountered: {errors}")
+
+    except (Error, IOError, ValueError) as e:
+        print(f"Fatal error during data import: {e}")
+        connection.rollback()
+    finally:
+        if cursor:
+            cursor.close()
+    return records_inserted, duplicates_skipped, errors
+
+
+def _count_quotes(mm, start, end, step=1 << 20):
+    return sum(mm[pos:min(pos + step, end)].count(b'"')
+               for pos in range(start, end, step))
+
+
+def shard_byte_ranges(filename, shards):
+    """Split the CSV body into (start, end) byte ranges on record boundaries.
+
+    A newline only ends a record when an even number of quotes precedes it,
+    so quoted fields may span lines; finding the bounds costs one pass that
+    counts quote bytes.
+    """
+    size = os.path.getsize(filename)
+    if size == 0:
+        return []
+    with open(filename, 'rb') as f, \
+            mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        scanned = quotes = 0
+
+        def record_start(pos):
+            """First record start after the record containing pos"""
+            nonlocal scanned, quotes
+            pos = max(pos, scanned)
+            while True:
+                newline = mm.find(b'\n', pos)
+                if newline < 0:
+                    return size
+                quotes += _count_quotes(mm, scanned, newline)
+                scanned = pos = newline + 1
+                if quotes % 2 == 0:
+                    return scanned
+
+        bounds = [record_start(0)]
+        body = size - bounds[0]
+        for i in range(1, shards):
+            bound = record_start(bounds[0] + body * i // shards)
+            if bounds[-1] < bound < size:
+                bounds.append(bound)
+    bounds.append(size)
+    return [(start, end) for start, end in zip(bounds, bounds[1:])
+            if start < end]
+
+
+def load_shard(filename, start, end, positions, chunk_size):
+    """Parse and insert one byte range over its own connection.
+
+    Returns (inserted, duplicates, errors, failure). If the shard stops
+    early, failure says why and the counts cover the chunks it committed.
+    """
+    totals = [0, 0, 0]
+    connection = cursor = None
+    try:
+        connection = get_pool().acquire()
+        cursor = connection.cursor()
+        rows = mmap_csv_rows(filename, start, end)
+        for chunk in chunk_records(rows, positions, chunk_size):
+            for i, count in enumerate(insert_chunk(connection, cursor, chunk)):
+                totals[i] += count
+    except Exception as e:
+        return (*totals, str(e) or repr(e))
+    finally:
+        if cursor is not None:
+            cursor.close()
+        if connection is not None:
+            connection.close()
+    return (*totals, None)
+
+
+def parallel_insert_data(filename, workers=None, shards=None,
+                         chunk_size=5000):
+    """Seed user_data from byte-range shards loaded by a process pool.
+
+    At most `workers` shards load at once, each on its own connection.
+    """
+    workers = workers or os.cpu_count() or 1
+    positions = csv_positions(list(next(mmap_csv_rows(filename), ())))
+    ranges = shard_byte_ranges(filename, shards or workers)
+
+    records_inserted = duplicates_skipped = errors = failed_shards = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(load_shard, filename, start, end, positions,
+                        chunk_size): (start, end)
+            for start, end in ranges
+        }
+        for future in as_completed(futures):
+            start, end = futures[future]
+            try:
+                inserted, duplicates, failed, failure = future.result()
+            except Exception as e:
+                inserted = duplicates = failed = 0
+                failure = str(e) or repr(e)
+            records_inserted += inserted
+            duplicates_skipped += duplicates
+            errors += failed
+            if failure is not None:
+                failed_shards += 1
+                print(f"Shard {start}-{end} stopped after {inserted} "
+                      f"inserts: {failure}")
+
+    print(f"\nData import summary ({len(ranges)} shards):")
+    print(f"Records inserted: {records_inserted}")
+    print(f"Duplicates skipped: {duplicates_skipped}")
+    print(f"Errors encountered: {errors}")
+    if failed_shards:
+        print(f"Shards stopped early: {failed_shards}")
+    return records_inserted, duplicates_skipped, errors
+
+
 if __name__ == "__main__":
     try:
         # Initial server connection
@@ -171,10 +512,11 @@ if __name__ == "__main__":
         # Table creation
         print("\n🛠 Creating/verifying table...")
         create_table(db_conn)
+        add_change_tracking(db_conn)
         
         # Data insertion
         print("\n📥 Importing data from CSV...")
-        insert_data(db_conn, "user_data.csv")  # Replace with your CSV path
+        bulk_insert_data(db_conn, "user_data.csv")  # Replace with your CSV path
         
     except Exception as e:
         print(f"\nFatal error: {e}")
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the ConnectionPool in connection_pool.py, with
+mysql.connector.connect patched to hand out mock connections.
+"""
+
+import gc
+import inspect
+import unittest
+from unittest.mock import Mock, patch
+
+import connection_pool
+from connection_pool import (
+    CHECKOUT_TIMEOUT, ConnectionPool, PoolTimeout, get_pool,
+)
+from seed import connect_to_prodev
+
+
+def fake_connection(**kwargs) -> Mock:
+    """A mock connection in a clean, reusable state."""
+    return Mock(unread_result=False, in_transaction=False)
+
+
+class PoolTestCase(unittest.TestCase):
+    """Base class patching connect for every test."""
+
+    def setUp(self) -> None:
+        """Patch mysql.connector.connect and silence pool notices."""
+        patcher = patch('connection_pool.mysql.connector.connect',
+                        side_effect=fake_connection)
+        self.connect = patcher.start()
+        self.addCleanup(patcher.stop)
+        printer = patch('builtins.print')
+        printer.start()
+        self.addCleanup(printer.stop)
+
+
+class TestConnectionPool(PoolTestCase):
+    """Tests for ConnectionPool checkout, release and reclaim."""
+
+    def test_opens_min_size_up_front(self) -> None:
+        """min_size connections exist before the first checkout."""
+        pool = ConnectionPool({}, min_size=3, max_size=5)
+        self.assertEqual(self.connect.call_count, 3)
+        stats = pool.stats()
+        self.assertEqual((stats["size"], stats["idle"]), (3, 3))
+
+    def test_close_returns_connection(self) -> None:
+        """close() hands the same raw connection to the next checkout."""
+        pool = ConnectionPool({}, min_size=0, max_size=1)
+        first = pool.acquire()
+        raw = first._conn
+        first.close()
+        second = pool.acquire()
+        self.assertIs(second._conn, raw)
+        self.assertEqual(self.connect.call_count, 1)
+
+    def test_acquire_times_out(self) -> None:
+        """A full pool raises PoolTimeout instead of blocking forever."""
+        pool = ConnectionPool({}, min_size=0, max_size=1)
+        held = pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(timeout=0.01)
+        held.close()
+
+    def test_default_timeout_is_finite(self) -> None:
+        """acquire() waits at most CHECKOUT_TIMEOUT by default."""
+        default = inspect.signature(
+            ConnectionPool.acquire).parameters["timeout"].default
+        self.assertEqual(default, CHECKOUT_TIMEOUT)
+        self.assertIsNotNone(default)
+
+    def test_leaked_checkout_is_reclaimed(self) -> None:
+        """A proxy dropped without close() frees its slot."""
+        pool = ConnectionPool({}, min_size=0, max_size=1)
+        leaked = pool.acquire()
+        raw = leaked._conn
+        del leaked
+        gc.collect()
+        raw.shutdown.assert_called_once()
+        self.assertEqual(pool.stats()["discarded"], 1)
+        pool.acquire(timeout=0.01).close()
+
+    def test_closed_proxy_is_not_reclaimed(self) -> None:
+        """Collecting a closed proxy leaves its pooled connection alone."""
+        pool = ConnectionPool({}, min_size=0, max_size=1)
+        conn = pool.acquire()
+        conn.close()
+        del conn
+        gc.collect()
+        self.assertEqual(pool.stats()["discarded"], 0)
+        self.assertEqual(pool.stats()["idle"], 1)
+
+    def test_unread_result_is_discarded(self) -> None:
+        """A connection with a pending result set is not reused."""
+        pool = ConnectionPool({}, min_size=0, max_size=1)
+        conn = pool.acquire()
+        conn._conn.unread_result = True
+        conn.close()
+        stats = pool.stats()
+        self.assertEqual((stats["size"], stats["discarded"]), (0, 1))
+
+    def test_unhealthy_idle_connection_is_replaced(self) -> None:
+        """A failed ping on checkout discards the idle connection."""
+        pool = ConnectionPool({}, min_size=1, max_size=1,
+                              health_check_after=0)
+        pool._idle[0][0].ping.side_effect = Exception("gone away")
+        pool.acquire().close()
+        self.assertEqual(self.connect.call_count, 2)
+        self.assertEqual(pool.stats()["discarded"], 1)
+
+
+class TestGetPool(PoolTestCase):
+    """Tests for the shared get_pool registry."""
+
+    def setUp(self) -> None:
+        """Start every test with an empty registry."""
+        super().setUp()
+        registry = patch.dict(connection_pool._pools, clear=True)
+        registry.start()
+        self.addCleanup(registry.stop)
+
+    def test_returns_shared_pool(self) -> None:
+        """Repeated calls with matching settings share one pool."""
+        pool = get_pool("test", {"database": "x"}, max_size=2)
+        self.assertIs(get_pool("test"), pool)
+        self.assertIs(get_pool("test", {"database": "x"}, max_size=2), pool)
+
+    def test_connect_to_prodev_retries_per_call(self) -> None:
+        """A per-call max_retries doesn't reconfigure the shared pool."""
+        connect_to_prodev().close()
+        conn = connect_to_prodev(max_retries=5)
+        self.assertIsNotNone(conn)
+        conn.close()
+
+    def test_rejects_changed_options(self) -> None:
+        """Options that differ from the existing pool raise ValueError."""
+        get_pool("test", {"database": "x"}, max_size=2)
+        with self.assertRaises(ValueError):
+            get_pool("test", max_size=5)
+        with self.assertRaises(ValueError):
+            get_pool("test", {"database": "y"})
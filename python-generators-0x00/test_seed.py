@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the mmap CSV tokenizer and the CSV helpers in seed.py.
+"""
+
+import csv
+import os
+import tempfile
+import unittest
+from unittest.mock import Mock
+
+from seed import (
+    chunk_records, load_data_infile, mmap_csv_rows, shard_byte_ranges,
+)
+
+
+class CsvFileTestCase(unittest.TestCase):
+    """Base class writing raw bytes to a scratch CSV file."""
+
+    def write_csv(self, data: bytes) -> str:
+        """Write data to a temporary file removed after the test."""
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        self.addCleanup(os.remove, path)
+        return path
+
+    def csv_module_rows(self, path: str) -> list:
+        """Rows as parsed by the standard csv module."""
+        with open(path, newline="", encoding="utf-8") as f:
+            return [tuple(row) for row in csv.reader(f)]
+
+
+class TestMmapCsvRows(CsvFileTestCase):
+    """Tests for mmap_csv_rows."""
+
+    def test_matches_csv_module(self) -> None:
+        """Well-formed input parses exactly like csv.reader."""
+        samples = [
+            b"a,b,c\n1,2,3\n",
+            b"a,b\r\n1,2\r\n",
+            b"a,b\n1,2",
+            b'a,b\n"x, y","say ""hi"""\n',
+            b'a,b\n"multi\nline",2\n',
+            b"a,b\n,\n",
+            b'a,b\n"",x\n',
+            b"a,b\n1,\n",
+            b"a,b\n1,",
+            "name\nJosé\n".encode("utf-8"),
+        ]
+        for data in samples:
+            with self.subTest(data=data):
+                path = self.write_csv(data)
+                self.assertEqual(list(mmap_csv_rows(path)),
+                                 self.csv_module_rows(path))
+
+    def test_blank_lines(self) -> None:
+        """Blank lines, including a trailing one, are empty records."""
+        path = self.write_csv(b"a,b\n\n1,2\n\n")
+        self.assertEqual(list(mmap_csv_rows(path)),
+                         [("a", "b"), (), ("1", "2"), ()])
+        self.assertEqual(list(mmap_csv_rows(path)),
+                         self.csv_module_rows(path))
+
+    def test_crlf_blank_line(self) -> None:
+        """A CRLF blank line is an empty record too."""
+        path = self.write_csv(b"a,b\r\n\r\n1,2\r\n")
+        self.assertEqual(list(mmap_csv_rows(path)),
+                         [("a", "b"), (), ("1", "2")])
+
+    def test_stray_quote_raises(self) -> None:
+        """A quote inside an unquoted field is an error, not skipped."""
+        for data in (b'id,email\n1,a"b@x.com\n',
+                     b'id,email\n1,"a"b@x.com\n',
+                     b'id,email\n1,"unterminated\n'):
+            with self.subTest(data=data):
+                path = self.write_csv(data)
+                with self.assertRaises(ValueError):
+                    list(mmap_csv_rows(path))
+
+    def test_empty_file(self) -> None:
+        """An empty file yields nothing."""
+        path = self.write_csv(b"")
+        self.assertEqual(list(mmap_csv_rows(path)), [])
+
+    def test_byte_range(self) -> None:
+        """start and end restrict parsing to the records in between."""
+        data = b"h1,h2\n1,a\n2,b\n3,c\n"
+        path = self.write_csv(data)
+        start = data.index(b"2,b")
+        end = data.index(b"3,c")
+        self.assertEqual(list(mmap_csv_rows(path, start, end)),
+                         [("2", "b")])
+        self.assertEqual(list(mmap_csv_rows(path, end)), [("3", "c")])
+        self.assertEqual(list(mmap_csv_rows(path, end, end)), [])
+
+
+class TestShardByteRanges(CsvFileTestCase):
+    """Tests for shard_byte_ranges."""
+
+    def test_shards_cover_every_record_once(self) -> None:
+        """Shards split only between records, even inside quoted newlines."""
+        rows = [("user_id", "name")]
+        rows += [(str(i), f'Name "{i}"\nline two' if i % 3 else f"N{i}")
+                 for i in range(200)]
+        fd, path = tempfile.mkstemp(suffix=".csv")
+        with os.fdopen(fd, "w", newline="") as f:
+            csv.writer(f).writerows(rows)
+        self.addCleanup(os.remove, path)
+
+        for shards in (1, 2, 7, 64):
+            with self.subTest(shards=shards):
+                ranges = shard_byte_ranges(path, shards)
+                self.assertLessEqual(len(ranges), shards)
+                parsed = [row for start, end in ranges
+                          for row in mmap_csv_rows(path, start, end)]
+                self.assertEqual(parsed, rows[1:])
+
+
+class TestChunkRecords(unittest.TestCase):
+    """Tests for chunk_records."""
+
+    def test_skips_blank_records(self) -> None:
+        """Empty records are dropped instead of raising IndexError."""
+        rows = [("n1", "e1"), (), ("n2", "e2")]
+        chunks = list(chunk_records(iter(rows), [None, 0, 1, None], 10))
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual([record[1:3] for record in chunks[0]],
+                         [("n1", "e1"), ("n2", "e2")])
+
+    def test_chunk_size(self) -> None:
+        """Records are grouped into lists of at most chunk_size."""
+        rows = [(str(i),) for i in range(5)]
+        chunks = list(chunk_records(iter(rows), [0], 2))
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+
+
+class TestLoadDataInfile(CsvFileTestCase):
+    """Tests for load_data_infile's result counts."""
+
+    def test_counts_records_not_lines(self) -> None:
+        """Quoted newlines don't turn into phantom skipped rows."""
+        path = self.write_csv(b'user_id,name,email,age\n'
+                              b'1,"two\nlines",a@x.com,30\n'
+                              b'2,b,b@x.com,31\n'
+                              b'3,c,c@x.com,32\n')
+        cursor = Mock(rowcount=2)
+        cursor.fetchone.return_value = (1,)
+        cursor.fetchall.return_value = [
+            ("Warning", 1062, "Duplicate entry 'c@x.com'"),
+        ]
+        connection = Mock()
+        connection.cursor.return_value = cursor
+        self.assertEqual(load_data_infile(connection, path), (2, 1, 0))